@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Microbenchmark for attribute dispatch in imsqtiv1.QTIObjectV1.
+
+Usage: bench_attributes.py [--n=<items>]
+
+Writes a synthetic QTI v1 file with n multiple choice items (100000 by
+default) and reads it with a SAX handler that creates a bare instance of
+the class QTIParserV1 would use for each element, recording its attribute
+names.  It then times finding the SetAttribute_ method for every
+attribute, both by building the method name and calling getattr (as
+ParseAttributes used to) and through the per-class handler dictionaries.
+The setters themselves are not called as most of them need a real parse tree."""
+
+import os, sys, time, tempfile, xml.sax
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from imsqtiv1 import QTIASI_ELEMENTS, ATTRIBUTE_HANDLERS
+
+
+ITEM="""<item ident="ITEM%(i)i" title="Item %(i)i" maxattempts="1">
+<presentation><material><mattext texttype="text/plain" xml:lang="en">Question %(i)i</mattext></material>
+<response_lid ident="R1" rcardinality="Single" rtiming="No"><render_choice shuffle="Yes">
+<response_label ident="A"><material><mattext>Alpha</mattext></material></response_label>
+<response_label ident="B"><material><mattext>Beta</mattext></material></response_label>
+</render_choice></response_lid></presentation>
+<resprocessing><outcomes><decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="1"/></outcomes>
+<respcondition title="correct"><conditionvar><varequal respident="R1" case="No">A</varequal></conditionvar>
+<setvar action="Set" varname="SCORE">1</setvar></respcondition></resprocessing>
+</item>
+"""
+
+
+class AttributeRecorder(xml.sax.handler.ContentHandler):
+	def __init__(self):
+		self.events=[]
+
+	def startElement(self,name,attrs):
+		objClass=QTIASI_ELEMENTS.get(name)
+		if objClass is not None and attrs.getLength():
+			self.events.append((objClass.__new__(objClass),list(attrs.keys())))
+
+
+def MakeFile (n):
+	f=tempfile.NamedTemporaryFile('w',suffix='.xml',delete=False,encoding='utf-8')
+	f.write('<?xml version="1.0" encoding="UTF-8"?>\n<questestinterop>\n<section ident="S1">\n')
+	for i in range(n):
+		f.write(ITEM%{'i':i})
+	f.write('</section>\n</questestinterop>\n')
+	f.close()
+	return f.name
+
+
+def GetattrDispatch (events):
+	"""The lookup done by ParseAttributes before handlers were cached"""
+	for obj,names in events:
+		for aName in names:
+			if aName[:4]=='xml:':
+				f=getattr(obj,'SetAttribute_xml_'+aName[4:],0)
+			elif aName[:6]=='webct:':
+				f=getattr(obj,'SetAttribute_webct_'+aName[6:],0)
+			else:
+				f=getattr(obj,'SetAttribute_'+aName,0)
+
+
+def CachedDispatch (events):
+	"""The lookup done by ParseAttributes now"""
+	for obj,names in events:
+		handlers=ATTRIBUTE_HANDLERS.get(obj.__class__)
+		if handlers is None:
+			handlers=ATTRIBUTE_HANDLERS[obj.__class__]={}
+		for aName in names:
+			try:
+				f=handlers[aName]
+			except KeyError:
+				f=handlers[aName]=obj.GetAttributeHandler(aName)
+
+
+if __name__ == '__main__':
+	n=100000
+	for x in sys.argv[1:]:
+		if x[:4]=="--n=":
+			n=int(x[4:])
+		else:
+			print(__doc__)
+			sys.exit(1)
+	fName=MakeFile(n)
+	try:
+		recorder=AttributeRecorder()
+		xml.sax.parse(fName,recorder)
+	finally:
+		os.remove(fName)
+	events=recorder.events
+	nAttrs=sum(len(names) for obj,names in events)
+	print("%i items: %i elements with %i attributes"%(n,len(events),nAttrs))
+	results=[]
+	for name,dispatch in (("getattr",GetattrDispatch),("cached",CachedDispatch)):
+		start=time.perf_counter()
+		dispatch(events)
+		t=time.perf_counter()-start
+		results.append(t)
+		print("%-8s %7.3f s (%.0f ns per attribute)"%(name,t,t*1e9/nAttrs))
+	print("speedup: %.1fx"%(results[0]/results[1]))
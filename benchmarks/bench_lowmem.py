@@ -0,0 +1,196 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Parity check and memory benchmark for the lowmem parsing mode.
+
+Usage: bench_lowmem.py [--n=<items>] [QTI file|directory...]
+
+Checks that QTIParserTarget generates the same events as saxify does from
+a document tree, for some awkward documents and for any QTI files given on
+the command line, then writes a synthetic QTI v1 file with n items (20000
+by default) and reports the time and peak memory (the maximum resident set
+size of a fresh process) needed to generate its events both ways."""
+
+import os, sys, io, time, tempfile, resource, subprocess
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from lxml import etree, sax
+from imsqtiv1 import QTIParserTarget
+
+
+DOCUMENTS=[
+	b'<a/>',
+	b'<a>text only</a>',
+	b'<a><!--just a comment--></a>',
+	b'<a x="1">before<b y="2"/>tail<!--c-->t2<?p d?>t3<![CDATA[<cd>]]>&amp;&#233;z</a>',
+	b'<?xml version="1.0"?>\n<!--pre--><?pi before?><a>\n<b>one</b>\n<b>two</b>\n</a><!--post-->\n',
+	b'<a xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2" xmlns:webct="http://www.webct.com/vista/assessment"'
+		b' webct:x="1" xml:lang="en"><webct:b/><c/></a>',
+	b'<a><b></a>',
+	b'<a><b>truncated',
+	b'<a>&amp;<b/>text</a',
+	b'<a><b/></a>junk<c/>',
+	]
+
+
+class EventRecorder:
+	"""Records the calls QTIParserV1 receives"""
+	def __init__(self):
+		self.events=[]
+
+	def startElementNS(self,name,qname,attrs):
+		self.events.append(('start',name,sorted(dict(attrs).items())))
+
+	def endElementNS(self,name,qname):
+		self.events.append(('end',name))
+
+	def characters(self,ch):
+		self.events.append(('characters',ch))
+
+	def startDocument(self): pass
+	def endDocument(self): pass
+	def startPrefixMapping(self,prefix,uri): pass
+	def endPrefixMapping(self,prefix): pass
+	def processingInstruction(self,target,data): pass
+
+
+def TreeEvents (f):
+	recorder=EventRecorder()
+	tree=etree.parse(f,etree.XMLParser(recover=True,resolve_entities=False))
+	if len(tree.getroot()):
+		sax.saxify(tree,recorder)
+	return recorder.events
+
+def TargetEvents (f):
+	recorder=EventRecorder()
+	etree.parse(f,etree.XMLParser(recover=True,resolve_entities=False,target=QTIParserTarget(recorder)))
+	return recorder.events
+
+
+def ListFiles (paths):
+	for path in paths:
+		if os.path.isdir(path):
+			for dirPath,dirNames,fileNames in os.walk(path):
+				for fileName in sorted(fileNames):
+					if fileName[-4:].lower() in ['.xml','.dat','.qti']:
+						yield os.path.join(dirPath,fileName)
+		else:
+			yield path
+
+
+ITEM="""<item ident="ITEM%(i)i" title="Item %(i)i">
+<presentation><material><mattext texttype="text/html"><![CDATA[<p>Question %(i)i, which of the following is <b>correct</b>?</p>]]></mattext></material>
+<response_lid ident="R1" rcardinality="Single"><render_choice shuffle="Yes">
+<response_label ident="A"><material><mattext>Alpha</mattext></material></response_label>
+<response_label ident="B"><material><mattext>Beta</mattext></material></response_label>
+</render_choice></response_lid></presentation>
+<resprocessing><outcomes><decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="1"/></outcomes>
+<respcondition><conditionvar><varequal respident="R1">A</varequal></conditionvar>
+<setvar action="Set" varname="SCORE">1</setvar></respcondition></resprocessing>
+</item>
+"""
+
+def MakeFile (n):
+	f=tempfile.NamedTemporaryFile('w',suffix='.xml',delete=False,encoding='utf-8')
+	f.write('<?xml version="1.0" encoding="UTF-8"?>\n<questestinterop>\n<section ident="S1">\n')
+	for i in range(n):
+		f.write(ITEM%{'i':i})
+	f.write('</section>\n</questestinterop>\n')
+	f.close()
+	return f.name
+
+
+class EventCounter(EventRecorder):
+	def __init__(self):
+		self.events=0
+
+	def startElementNS(self,name,qname,attrs):
+		self.events+=1
+
+	def endElementNS(self,name,qname):
+		self.events+=1
+
+	def characters(self,ch):
+		self.events+=1
+
+def CountTreeEvents (fName):
+	counter=EventCounter()
+	sax.saxify(etree.parse(fName,etree.XMLParser(recover=True,resolve_entities=False)),counter)
+	return counter.events
+
+def CountTargetEvents (fName):
+	counter=EventCounter()
+	etree.parse(fName,etree.XMLParser(recover=True,resolve_entities=False,target=QTIParserTarget(counter)))
+	return counter.events
+
+
+PARSERS={'tree':CountTreeEvents,'lowmem':CountTargetEvents}
+
+def Measure (mode,fName):
+	"""Runs in a child process so that peak memory is measured separately"""
+	start=time.perf_counter()
+	events=PARSERS[mode](fName)
+	t=time.perf_counter()-start
+	peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+	print("%-7s %i events in %6.2f s, peak memory %7.1f MB"%(mode,events,t,peak))
+
+
+if __name__ == '__main__':
+	n=20000
+	paths=[]
+	for x in sys.argv[1:]:
+		if x[:4]=="--n=":
+			n=int(x[4:])
+		elif x[:10]=="--measure=":
+			Measure(x[10:],sys.argv[-1])
+			sys.exit(0)
+		elif x[:2]=="--":
+			print(__doc__)
+			sys.exit(1)
+		else:
+			paths.append(x)
+	sources=[(repr(d[:40]),d) for d in DOCUMENTS]
+	for path in ListFiles(paths):
+		with open(path,'rb') as f:
+			sources.append((path,f.read()))
+	for name,data in sources:
+		if TreeEvents(io.BytesIO(data))!=TargetEvents(io.BytesIO(data)):
+			print("MISMATCH: %s"%name)
+			sys.exit(1)
+	print("%i documents generate identical events"%len(sources))
+	fName=MakeFile(n)
+	try:
+		print("%i items, %i bytes"%(n,os.path.getsize(fName)))
+		sys.stdout.flush()
+		for mode in ("tree","lowmem"):
+			subprocess.call([sys.executable,os.path.abspath(__file__),"--measure="+mode,fName])
+	finally:
+		os.remove(fName)
@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""End to end benchmark of migrate.py on a synthetic corpus.
+
+Usage: bench_migrate.py [--seed=<n>] [--files=<n>] [--items=<n>] [--html=<n>]
+	[--corpus=<directory>] [--repeat=<n>] [--save=<file>] [--compare=<file>]
+	[migrate.py options...]
+
+Generates a corpus with qticorpus.py (or uses the QTI files in --corpus) and
+converts it with migrate.py in a fresh process, repeat times (3 by default),
+passing on any options not recognized here (e.g. --jobs=4 or --lowmem).  The
+fastest run is reported as items/sec, input MB/sec, the peak resident set
+size of the conversion and the time spent in each phase (from --stats).
+
+--save writes the results to a JSON file, --compare reports the change in
+each measurement against results saved earlier.  Baselines are only
+comparable on the same machine with the same corpus arguments."""
+
+import os, sys, json, time, shutil, tempfile, subprocess
+
+from qticorpus import CorpusGenerator, ParseArguments
+
+MIGRATE=os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","migrate.py")
+
+
+def CorpusSize (path):
+	"""Returns the number of bytes of QTI files in path"""
+	size=0
+	for dirPath,dirNames,fileNames in os.walk(path):
+		for fileName in fileNames:
+			if fileName[-4:].lower() in ['.xml','.dat','.qti']:
+				size+=os.path.getsize(os.path.join(dirPath,fileName))
+	return size
+
+def RunMigrate (corpus,workDir,options):
+	"""Converts corpus in a child process, returns (seconds,maxRSS,report)"""
+	outDir=os.path.join(workDir,"out")
+	statsPath=os.path.join(workDir,"stats.json")
+	shutil.rmtree(outDir,ignore_errors=True)
+	args=[sys.executable,MIGRATE,"--nogui","--overwrite","--quiet","--cpout="+outDir,"--stats="+statsPath]+options+[corpus]
+	with open(os.path.join(workDir,"stderr.txt"),'w+') as errors:
+		start=time.perf_counter()
+		p=subprocess.Popen(args,stdout=subprocess.DEVNULL,stderr=errors)
+		pid,status,usage=os.wait4(p.pid,0)
+		seconds=time.perf_counter()-start
+		p.returncode=os.waitstatus_to_exitcode(status)
+		if p.returncode:
+			errors.seek(0)
+			sys.stderr.write(errors.read())
+			raise RuntimeError("migrate.py failed with exit code %i"%p.returncode)
+	with open(statsPath,encoding='utf-8') as f:
+		report=json.load(f)
+	# ru_maxrss includes the workers, which have been waited for
+	return seconds,usage.ru_maxrss,report
+
+def Measure (corpus,workDir,options,repeat):
+	best=None
+	for i in range(repeat):
+		seconds,maxRSS,report=RunMigrate(corpus,workDir,options)
+		print("run %i: %.2f s"%(i+1,seconds))
+		if best is None or seconds<best[0]:
+			best=(seconds,maxRSS,report)
+	seconds,maxRSS,report=best
+	size=CorpusSize(corpus)
+	items=report['totals']['items']
+	return {
+		'seconds':seconds,
+		'items':items,
+		'bytes':size,
+		'itemsPerSecond':items/seconds,
+		'MBPerSecond':size/seconds/1e6,
+		'maxRSSMB':maxRSS/1024.0,
+		'phases':report['phases']}
+
+def PrintResults (results,baseline=None):
+	rows=[('seconds','%.2f','s'),('items','%i',''),('itemsPerSecond','%.1f','items/s'),
+		('MBPerSecond','%.2f','MB/s'),('maxRSSMB','%.1f','MB peak RSS')]
+	for key,format,unit in rows:
+		PrintRow(key,format,unit,results[key],baseline[key] if baseline else None)
+	print("phases:")
+	phases=results['phases']
+	for phase in sorted(phases,key=lambda x:-phases[x]):
+		PrintRow("  "+phase,'%.3f','s',phases[phase],baseline['phases'].get(phase) if baseline else None)
+
+def PrintRow (name,format,unit,value,old):
+	line="%-16s %12s %s"%(name,format%value,unit)
+	if old:
+		line="%-40s (was %s, %+.1f%%)"%(line,format%old,(value-old)*100.0/old)
+	print(line)
+
+
+if __name__ == '__main__':
+	generator=CorpusGenerator()
+	corpus=None
+	repeat=3
+	savePath=None
+	comparePath=None
+	options=[]
+	for x in ParseArguments(sys.argv[1:],generator):
+		if x[:9]=="--corpus=":
+			corpus=os.path.abspath(x[9:])
+		elif x[:9]=="--repeat=":
+			repeat=max(1,int(x[9:]))
+		elif x[:7]=="--save=":
+			savePath=x[7:]
+		elif x[:10]=="--compare=":
+			comparePath=x[10:]
+		elif x=="--help" or x[:2]!="--":
+			print(__doc__)
+			sys.exit(1)
+		else:
+			options.append(x)
+	if corpus:
+		settings={'corpus':corpus}
+	else:
+		settings={'seed':generator.seed,'files':generator.files,'items':generator.items,'html':generator.html}
+	settings['options']=options
+	baseline=None
+	if comparePath:
+		with open(comparePath,encoding='utf-8') as f:
+			saved=json.load(f)
+		if saved['settings']!=settings:
+			print("Warning: baseline was measured with different settings: %s"%json.dumps(saved['settings']))
+		baseline=saved['results']
+	workDir=tempfile.mkdtemp()
+	try:
+		if not corpus:
+			corpus=os.path.join(workDir,"corpus")
+			generator.Write(corpus)
+		results=Measure(corpus,workDir,options,repeat)
+	finally:
+		shutil.rmtree(workDir,ignore_errors=True)
+	PrintResults(results,baseline)
+	if savePath:
+		with open(savePath,'w',encoding='utf-8') as f:
+			json.dump({'settings':settings,'results':results},f,indent=1)
+			f.write('\n')
+		print("Results saved to %s"%savePath)
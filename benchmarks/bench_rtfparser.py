@@ -0,0 +1,327 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Parity check and throughput benchmark for rtfutils.RTFParser.
+
+Usage: bench_rtfparser.py [--repeat=<n>] [--fuzz=<n>]
+
+Tokenizes some synthetic WebCT style RTF with RTFParser and with the
+original character-by-character tokenizer, checking that both give the
+same tokens, warnings and exceptions, and reports the throughput of each
+in MB/s.  Random strings built from awkward fragments are also compared.
+
+The original tokenizer copied picture data into the text, RTFParser skips
+\\pict groups, so pictures are left out of the random strings and the
+picture sample is timed but not compared."""
+
+import os, sys, io, timeit, random, contextlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from rtfutils import RTFParser, RTFException, RTFState, RTFIgnorable
+from logutils import LOG
+
+
+class CharRTFParser:
+	"""The tokenizer used before RTFParser was driven by regular expressions"""
+	def __init__(self):
+		self.ResetParser()
+
+	def ResetParser(self):
+		self.tokens=[]
+		self.chars=[]
+		self.formatTags=[]
+		self.state=RTFState()
+		self.stack=[]
+		self.popen=0
+
+	def HandleUnknown(self,name,param):
+		if name not in RTFIgnorable and not self.state.ignoreGroup:
+			print("Ignoring unknown RTF Control word: %s"%name)
+
+	def HandleUnknownSymbol(self,symbol):
+		print('Ignoring unknown RTF Control symbol: "%s"'%symbol)
+		pass
+
+	def Handle_uc(self,name,param):
+		self.state.uc=param
+
+	def Handle_u(self,name,param):
+		if not self.state.ignoreGroup:
+			self.chars.append(chr(param))
+			self.Consume(self.state.uc)
+
+	def Handle_fonttbl(self,name,param):
+		self.state.ignoreGroup=1
+
+	def Handle_fcharset(self,name,param):
+		if param==2:
+			print("Warning: RTF content defines unsupported Symbol font, check for bad characters")
+		elif param:
+			print("Warning: RTF content defines unsupported fcharset, check for bad characters")
+
+	def Handle_pard(self,name,param):
+		# reset default paragraph properties
+		pass
+
+	def Handle_plain(self,name,param):
+		# reset default character formatting
+		self.state.ResetFormatting()
+		self.StateChanged()
+
+	def Handle_par(self,name,param):
+		# End of paragraph
+		self.EndString()
+		if self.popen:
+			self.tokens.append({'.name':'p','.type':'ETag'})
+		self.tokens.append({'.name':'p','.type':'STag'})
+		self.popen=1
+
+	def Handle_line(self,name,param):
+		# line break
+		self.EndString()
+		self.tokens.append({'.name':'br','.type':'EmptyElemTag'})
+
+	def Handle_tab(self,name,param):
+		self.chars.append('\t')
+
+	def Handle_lquote(self,name,param):
+		self.chars.append(chr(0x2018))
+
+	def Handle_rquote(self,name,param):
+		self.chars.append(chr(0x2019))
+
+	def Handle_ldblquote(self,name,param):
+		self.chars.append(chr(0x201C))
+
+	def Handle_rdblquote(self,name,param):
+		self.chars.append(chr(0x201D))
+
+	def Handle_b(self,name,param):
+		if param is None:
+			param=1
+		self.state.bold=param
+		self.StateChanged()
+
+	def Handle_i(self,name,param):
+		if param is None:
+			param=1
+		self.state.italic=param
+		self.StateChanged()
+
+	def Handle_fs(self,name,param):
+		# font size specification; 24 is default (units are 0.5pt)
+		if param<22:
+			self.state.size=-1
+		elif param>26:
+			self.state.size=1
+		else:
+			self.state.size=0
+		self.StateChanged()
+
+	def Handle_f(self,name,param):
+		# so you want to set the font then?
+		pass
+
+	def Handle_lang(self,name,param):
+		print("Warning: RTF language specification currently ignored (%i)"%param)
+
+	def TokenizeString(self,input):
+		self.ResetParser()
+		self.input=input
+		self.pos=0
+		self.Consume(0)
+		while self.c:
+			if self.ParseChar('\\'):
+				if self.c.isalpha():
+					# Control Word
+					cword=self.ParseControlWord()
+					# Horribly, we use introspection here
+					getattr(self,"Handle_%s"%cword['.name'],self.HandleUnknown)(cword['.name'],cword.get('.param',None))
+				else:
+					# Control symbol
+					cword={'.name':self.c}
+					self.Consume(1)
+					getattr(self,"Handle_X%2X"%ord(cword['.name']),self.HandleUnknownSymbol)(cword['.name'])
+			elif self.ParseChar('{'):
+				# start of a group
+				self.stack.append(self.state)
+				self.state=self.state.Clone()
+			elif self.ParseChar('}'):
+				# end of a group
+				if self.stack:
+					self.state=self.stack.pop()
+					self.StateChanged()
+				else:
+					raise RTFException('too many "}" at "%s..."'%self.input[self.pos:self.pos+8])
+			else:
+				if not self.state.ignoreGroup:
+					self.chars.append(self.c)
+				self.Consume(1)
+		self.EndString()
+		if self.popen:
+			self.tokens.append({'.name':'p','.type':'ETag'})
+		return self.tokens
+
+	def ParseControlWord(self):
+		cword={}
+		name=self.ParseLetterSequence()
+		cword['.name']=name
+		if self.c==" ":
+			self.Consume(1)
+		elif self.c.isdigit() or self.c=="-":
+			param=self.ParseNumber()
+			if self.c==" ":
+				self.Consume(1)
+			cword['.param']=param
+		return cword
+
+	def ParseLetterSequence(self):
+		name=[]
+		while self.c:
+			# strictly speaking these should be lower case
+			# and they are supposed to be no more than 32 chars
+			if self.c.isalpha():
+				name.append(self.c)
+				self.Consume(1)
+			else:
+				break
+		return ''.join(name)
+
+	def ParseNumber(self):
+		num=[]
+		if self.c=="-":
+			value=-1
+			self.Consume(1)
+		else:
+			value=1
+		while self.c:
+			if self.c.isdigit():
+				num.append(self.c)
+				self.Consume(1)
+			else:
+				break
+		if not num:
+			raise RTFException('bad control word at "%s..."'%self.input[self.pos:self.pos+8])
+		else:
+			return value*int(''.join(num))
+
+	def ParseChar (self,c):
+		if self.c==c:
+			self.Consume(1)
+			return 1
+		else:
+			return 0
+
+	def StateChanged(self):
+		newFormat=self.state.GetFormatTags()
+		if newFormat!=self.formatTags:
+			self.EndString()
+			self.formatTags=newFormat
+
+	def EndString(self):
+		if self.chars:
+			if self.formatTags:
+				for t in self.formatTags:
+					self.tokens.append({'.name':t,'.type':'STag'})
+			self.tokens.append(''.join(self.chars))
+			if self.formatTags:
+				self.formatTags.reverse()
+				for t in self.formatTags:
+					self.tokens.append({'.name':t,'.type':'ETag'})
+			self.chars=[]
+
+	def Consume(self,nChars):
+		self.pos+=nChars
+		self.c=self.input[self.pos:self.pos+1]
+
+
+FONTTABLE=("{\\fonttbl"+''.join("{\\f%i\\fswiss\\fcharset0 Font Family Number %i;}"%(i,i) for i in range(400))+
+	"{\\f400\\fnil\\fcharset2 Symbol;}}")
+PARAGRAPH=("\\pard\\plain\\f0\\fs24 Which of the \\b following\\b0  statements about "
+	"{\\i photosynthesis} is \\ldblquote correct\\rdblquote ? caf\\u233 ?\\par\n")
+PICTURE="{\\pict\\wmetafile8\\picw2000\\pich1000 "+"0123456789abcdef"*4096+"}"
+
+SAMPLES=[
+	("paragraphs",1,"{\\rtf1\\ansi\\deff0"+PARAGRAPH*200+"}"),
+	("font table",1,"{\\rtf1\\ansi\\deff0"+FONTTABLE+PARAGRAPH+"}"),
+	("picture",0,"{\\rtf1\\ansi\\deff0"+PARAGRAPH+PICTURE+PARAGRAPH+"}"),
+	]
+
+FRAGMENTS=['\\','{','}',' ','-','1','12','x','\\b','\\b0','\\i','\\fs18','\\fs30','\\par','\\line',
+	'\\u233','\\u-3','\\uc2','\\uc0','\\fonttbl','\\fcharset2','\\fcharset0','\\plain','\\lang',
+	'\\foo','\\\'e9','\\*','\\~','\\{','\\\\','\u00e9','\u00b2','\u0660',' text ','\n']
+
+
+def Tokenize (parserClass,src):
+	out=io.StringIO()
+	# RTFParser logs its messages, the old parser prints them
+	LOG.StartCapture()
+	with contextlib.redirect_stdout(out):
+		try:
+			result=parserClass().TokenizeString(src)
+		except (RTFException,ValueError,TypeError,OverflowError) as e:
+			result=(e.__class__.__name__,str(e))
+	for level,message,file in LOG.EndCapture():
+		out.write(message+'\n')
+	return result,out.getvalue()
+
+
+if __name__ == '__main__':
+	repeat=10
+	fuzz=20000
+	for x in sys.argv[1:]:
+		if x[:9]=="--repeat=":
+			repeat=int(x[9:])
+		elif x[:7]=="--fuzz=":
+			fuzz=int(x[7:])
+		else:
+			print(__doc__)
+			sys.exit(1)
+	rng=random.Random(1)
+	for i in range(fuzz):
+		src=''.join(rng.choice(FRAGMENTS) for j in range(rng.randint(1,12)))
+		old=Tokenize(CharRTFParser,src)
+		new=Tokenize(RTFParser,src)
+		if old!=new:
+			print("MISMATCH: %s\n%s\n%s"%(repr(src),repr(old),repr(new)))
+			sys.exit(1)
+	print("%i random strings tokenized identically"%fuzz)
+	for name,compare,src in SAMPLES:
+		if compare and Tokenize(RTFParser,src)!=Tokenize(CharRTFParser,src):
+			print("MISMATCH: %s"%name)
+			sys.exit(1)
+		mb=len(src)*repeat/1e6
+		LOG.StartCapture()
+		with contextlib.redirect_stdout(io.StringIO()):
+			tOld=timeit.timeit(lambda:CharRTFParser().TokenizeString(src),number=repeat)
+			tNew=timeit.timeit(lambda:RTFParser().TokenizeString(src),number=repeat)
+		LOG.EndCapture()
+		print("%-10s %7i chars: %7.2f MB/s -> %7.2f MB/s (%.0fx)"%(name,len(src),mb/tOld,mb/tNew,tOld/tNew))
@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Benchmark for ContentPackage identifier and file name allocation.
+
+Usage: bench_uniqueid.py [--n=<idents>] [--naive=<idents>]
+
+Allocates n identifiers and n file names that all share the same base, as
+happens when a vendor export reuses one ident for thousands of items.  The
+original probing allocator is quadratic in the number of collisions so it is
+only timed for the first --naive allocations and its time for n is
+extrapolated."""
+
+import os, sys, time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from imscp import ContentPackage, CPResource
+
+
+class ProbingPackage:
+	"""The allocator used before the suffix index was added"""
+	def __init__(self):
+		self.idSpace={}
+		self.fileSpace={}
+
+	def GetUniqueID (self,baseStr):
+		idStr=baseStr
+		idExtra=1
+		while idStr in self.idSpace:
+			idStr=baseStr+'-'+str(idExtra)
+			idExtra=idExtra+1
+		return idStr
+
+	def GetUniqueFileName (self,fName,dataHash=None):
+		nameParts=fName.split(".")
+		stem=nameParts[0]
+		i=0
+		while True:
+			if i:
+				nameParts[0]='%s-%i'%(stem,i)
+			else:
+				nameParts[0]=stem
+			fName='.'.join(nameParts)
+			if fName in self.fileSpace:
+				if dataHash and self.fileSpace[fName]==dataHash:
+					break
+				i+=1
+				continue
+			break
+		self.fileSpace[fName]=dataHash
+		return fName
+
+
+def Allocate (cp,n):
+	start=time.perf_counter()
+	for i in range(n):
+		r=CPResource()
+		r.SetIdentifier("QUESTION_1")
+		cp.idSpace[cp.GetUniqueID(r.id)]=r
+		cp.GetUniqueFileName(os.path.join("assessmentItems","QUESTION_1.xml"))
+	return time.perf_counter()-start
+
+
+if __name__ == '__main__':
+	n=100000
+	naive=2000
+	for x in sys.argv[1:]:
+		if x[:4]=="--n=":
+			n=int(x[4:])
+		elif x[:8]=="--naive=":
+			naive=int(x[8:])
+		else:
+			print(__doc__)
+			sys.exit(1)
+	naive=min(n,naive)
+	t=Allocate(ContentPackage(),n)
+	print("indexed: %i colliding idents in %.3fs (%.1f us/ident)"%(n,t,t*1e6/n))
+	tNaive=Allocate(ProbingPackage(),naive)
+	print("probing: %i colliding idents in %.3fs (%.1f us/ident)"%(naive,tNaive,tNaive*1e6/naive))
+	if naive<n:
+		# probing cost grows with the square of the number of collisions
+		tNaive=tNaive*(float(n)/naive)**2
+		print("probing: %i colliding idents estimated at %.1fs"%(n,tNaive))
+	print("speedup: %.0fx"%(tNaive/t))
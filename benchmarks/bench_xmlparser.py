@@ -0,0 +1,257 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Parity check and microbenchmark for xmlutils.XMLParser.
+
+Usage: bench_xmlparser.py [--repeat=<n>] [--fuzz=<n>]
+
+Tokenizes a few typical kinds of embedded HTML with XMLParser and with the
+original character-by-character tokenizer, checking that both give the same
+tokens (or raise the same exception) and reporting the time taken.  Random
+strings built from awkward fragments are also compared."""
+
+import os, sys, timeit, random, html.entities
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from xmlutils import XMLParser, XMLException, NMTOKEN_CHARS, NMSTART_CHARS, SCHARS
+from logutils import LOG
+
+
+class CharXMLParser:
+	"""The tokenizer used before XMLParser was driven by regular expressions"""
+	def __init__(self,entityMap=None):
+		self.entityMap=entityMap
+		if not self.entityMap:
+			self.entityMap={
+				'quot':'"',
+				'apos':"'",
+				'amp':'&',
+				'lt':'<',
+				'gt':'>',
+				'nbsp':chr(160)
+				}
+
+	def TokenizeString(self,input):
+		self.input=input
+		self.pos=0
+		self.Consume(0)
+		tokens=[]
+		chars=[]
+		while self.c:
+			if self.ParseChar('<'):
+				if self.ParseChar('/'):
+					tag=self.ParseETag()
+				else:
+					# may return '<' if no name followed
+					tag=self.ParseTag()
+				if chars:
+					tokens.append(''.join(chars))
+					chars=[]
+				tokens.append(tag)
+			elif self.ParseChar('&'):
+				chars.append(self.ParseReference())
+			else:
+				chars.append(self.c)
+				self.Consume(1)
+		if chars:
+			tokens.append(''.join(chars))
+			chars=[]
+		return tokens
+
+	def ParseTag(self):
+		tag={}
+		name=self.ParseName()
+		if not name:
+			return '<'
+		tag['.name']=name
+		while True:
+			self.SkipSpace()
+			if not self.c:
+				raise XMLException("unexpected end of tag")
+			if self.ParseChar('>'):
+				tag['.type']='STag'
+				break
+			elif self.ParseChar('/'):
+				if self.ParseChar('>'):
+					tag['.type']='EmptyElemTag'
+					break
+				else:
+					print(self.input[self.pos:])
+					raise XMLException("expected: end of tag")
+			else:
+				aName=self.ParseName()
+				if not aName:
+					raise XMLException("expected: Attribute")
+				self.SkipSpace()
+				if not self.ParseChar('='):
+					raise XMLException("expected: Eq")
+				self.SkipSpace()
+				aValue=self.ParseAttValue()
+				tag[aName]=aValue
+		return tag
+
+	def ParseETag(self):
+		tag={}
+		tag['.name']=self.ParseName()
+		tag['.type']='ETag'
+		self.SkipSpace()
+		if not self.ParseChar('>'):
+			raise XMLException("unexpected end of tag")
+		return tag
+
+	def ParseAttValue(self):
+		delim=None
+		value=[]
+		if self.ParseChar('"'):
+			delim='"'
+		elif self.ParseChar("'"):
+			delim="'"
+		else:
+			raise XMLException("expected: AttValue")
+		while True:
+			if not self.c:
+				raise XMLException("unexpected end of AttValue")
+			elif self.c==delim:
+				self.Consume(1)
+				break
+			elif self.c=='&':
+				self.Consume(1)
+				value.append(self.ParseReference())
+			else:
+				value.append(self.c)
+				self.Consume(1)
+		return ''.join(value)
+
+	def ParseReference (self):
+		if self.ParseChar('#'):
+			if self.ParseChar('x'):
+				value=chr(int(self.ParseName(1),16))
+			else:
+				value=chr(int(self.ParseName(1)))
+		else:
+			name=self.ParseName()
+			value=self.entityMap.get(name.lower(),chr(html.entities.name2codepoint.get(name.lower(),63)))
+		# forgive the lack of a semi-colon
+		self.ParseChar(';')
+		return value
+
+	def ParseName (self,numbersAllowed=0):
+		name=[]
+		# Names end with a space, '>', '/>' or ';'
+		while self.c:
+			if ord(self.c) in SCHARS:
+				break
+			if self.c in "<>/;=":
+				break
+			if name or numbersAllowed:
+				if not (self.c in NMTOKEN_CHARS or ord(self.c)>128):
+					break
+			else:
+				if not (self.c in NMSTART_CHARS or ord(self.c)>128):
+					break
+			name.append(self.c)
+			self.Consume(1)
+		return ''.join(name)
+
+	def SkipSpace (self):
+		while self.c:
+			if ord(self.c) in SCHARS:
+				self.Consume(1)
+			else:
+				break
+
+	def ParseChar (self,c):
+		if self.c==c:
+			self.Consume(1)
+			return 1
+		else:
+			return 0
+
+	def Consume(self,nChars):
+		self.pos+=nChars
+		self.c=self.input[self.pos:self.pos+1]
+
+
+SAMPLES=[
+	("plain text","Which of the following statements about photosynthesis is correct? "*4),
+	("markup",'<p>Select the <b>best</b> answer &amp; explain: <img src="images/fig1.png" alt="Figure 1"/></p>'*8),
+	("entities","x &lt; y &amp;&amp; y &gt; z &nbsp;&eacute;&#233;&#xe9;&bogus; 3 < 4 "*10),
+	("accented","<p lang='fr'>Qu'est-ce que la d\u00e9mocratie? R\u00e9pondez \u00e0 la question suivante.</p>"*6),
+	("long html",'<table summary="data"><tr><td class="c1">x &lt; 10</td><td>\u00b5m</td></tr></table>\n'*200),
+	]
+
+FRAGMENTS=['<','>','/','</','/>','&','&#','&#x','#',';','=','"',"'",' ','\t','\n',
+	'p','b1','img','_x','1','.',':','-','a=','a="v"',"a='v'",'amp','lt','eacute','41','4F',
+	'\u00e9','\u0080','\u0081','\u4e2d',' text ']
+
+
+def Tokenize (parserClass,src):
+	try:
+		return parserClass().TokenizeString(src)
+	except (XMLException,ValueError,OverflowError) as e:
+		return (e.__class__.__name__,str(e))
+
+
+if __name__ == '__main__':
+	repeat=200
+	fuzz=20000
+	for x in sys.argv[1:]:
+		if x[:9]=="--repeat=":
+			repeat=int(x[9:])
+		elif x[:7]=="--fuzz=":
+			fuzz=int(x[7:])
+		else:
+			print(__doc__)
+			sys.exit(1)
+	devnull=open(os.devnull,'w')
+	stdout=sys.stdout
+	rng=random.Random(1)
+	for i in range(fuzz):
+		src=''.join(rng.choice(FRAGMENTS) for j in range(rng.randint(1,12)))
+		# the parsers report the remaining input before some errors
+		sys.stdout=devnull
+		LOG.StartCapture()
+		old=Tokenize(CharXMLParser,src)
+		new=Tokenize(XMLParser,src)
+		LOG.EndCapture()
+		sys.stdout=stdout
+		if old!=new:
+			print("MISMATCH: %s\n%s\n%s"%(repr(src),repr(old),repr(new)))
+			sys.exit(1)
+	print("%i random strings tokenized identically"%fuzz)
+	for name,src in SAMPLES:
+		if Tokenize(XMLParser,src)!=Tokenize(CharXMLParser,src):
+			print("MISMATCH: %s"%name)
+			sys.exit(1)
+		tOld=timeit.timeit(lambda:CharXMLParser().TokenizeString(src),number=repeat)
+		tNew=timeit.timeit(lambda:XMLParser().TokenizeString(src),number=repeat)
+		print("%-10s %6i chars: %8.2f us -> %7.2f us (%.1fx)"%(name,len(src),
+			tOld*1e6/repeat,tNew*1e6/repeat,tOld/tNew))
@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Microbenchmark for xmlutils.XMLString.
+
+Usage: bench_xmlstring.py [--repeat=<n>]
+
+Times XMLString against the original character-by-character escaper on
+a few typical kinds of attribute value and text node, and checks that
+both give the same output."""
+
+import os, sys, timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","lib"))
+from xmlutils import XMLString
+
+
+def CharXMLString (src):
+	"""The escaper used before XMLString worked on whole strings"""
+	dst=""
+	if src:
+		for c in src:
+			if c=='&':
+				dst=dst+"&amp;"
+			elif c=='<':
+				dst=dst+"&lt;"
+			elif c=='>':
+				dst=dst+"&gt;"
+			elif c=='"':
+				dst=dst+'&quot;'
+			elif ord(c)>128:
+				dst=dst+"&#"+str(ord(c))+';'
+			else:
+				dst=dst+c
+	return dst
+
+
+SAMPLES=[
+	("identifier","RESPONSE_4394086650391"),
+	("plain text","Which of the following statements about photosynthesis is correct? "*4),
+	("markup",'<p>Select the <b>best</b> answer &amp; explain: <img src="images/fig1.png" alt="Figure 1"/></p>'*8),
+	("accented","Qu'est-ce que la démocratie? Répondez à la question suivante. "*6),
+	("long html",'<table summary="data"><tr><td>x &lt; 10</td><td>µm</td></tr></table>'*200),
+	]
+
+
+if __name__ == '__main__':
+	repeat=2000
+	for x in sys.argv[1:]:
+		if x[:9]=="--repeat=":
+			repeat=int(x[9:])
+		else:
+			print(__doc__)
+			sys.exit(1)
+	for name,src in SAMPLES:
+		if XMLString(src)!=CharXMLString(src):
+			print("MISMATCH: %s"%name)
+			sys.exit(1)
+		tOld=timeit.timeit(lambda:CharXMLString(src),number=repeat)
+		tNew=timeit.timeit(lambda:XMLString(src),number=repeat)
+		print("%-10s %6i chars: %8.2f us -> %7.2f us (%.0fx)"%(name,len(src),
+			tOld*1e6/repeat,tNew*1e6/repeat,tOld/tNew))
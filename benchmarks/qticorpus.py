@@ -0,0 +1,308 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+"""Generates a synthetic QTI v1.2 corpus for benchmarking.
+
+Usage: qticorpus.py [--seed=<n>] [--files=<n>] [--items=<n>] [--html=<n>] <output directory>
+
+Writes <files> QTI files of <items> items each (20 files of 50 items by
+default) plus the images they refer to.  The items cycle through the kinds of
+question found in real exports: choice, multiple response, string and
+numeric fill in the blank and hotspot questions, Blackboard, WebCT and D2L
+calculated questions, and essays with RTF question text.  Question text is
+HTML with <html> paragraphs (4 by default) of random words.  Every other file
+is an assessment with WebCT and D2L settings, the rest are sections of
+items with Blackboard metadata.
+
+The output depends only on the arguments, the same seed always generates
+the same bytes."""
+
+import os, sys, random, struct, zlib
+
+
+WORDS=("the","a","of","which","following","value","energy","cell","market","river",
+	"theorem","is","are","not","correct","statement","about","photosynthesis","démocratie",
+	"équation","größte","curve","ratio","sample","mean","force","protein","century","why",
+	"describe","explain","select","true","false","all","none","that","apply","μm","x²")
+
+IMAGES=8
+
+ITEM_KINDS=("choice","multiple","fib","numeric","hotspot","bb8calculated","webctcalculated",
+	"d2lcalculated","rtfessay")
+
+
+def XMLText (text):
+	return text.replace('&','&amp;').replace('<','&lt;').replace('>','&gt;').replace('"','&quot;')
+
+
+class CorpusGenerator:
+	"""Generates the files of a synthetic corpus from a seeded random
+	number generator"""
+	def __init__(self,seed=1,files=20,items=50,html=4):
+		self.seed=seed
+		self.files=files
+		self.items=items
+		self.html=html
+
+	def Write (self,path):
+		"""Writes the corpus to the directory path, returns the number of
+		items written"""
+		rng=random.Random(self.seed)
+		os.makedirs(os.path.join(path,"img"),exist_ok=True)
+		for i in range(IMAGES):
+			with open(os.path.join(path,"img","figure%i.png"%i),'wb') as f:
+				f.write(MakePNG(16+i*8,16+i*4,i))
+		count=0
+		for i in range(self.files):
+			with open(os.path.join(path,"bank%03i.xml"%i),'w',encoding='utf-8') as f:
+				f.write(self.MakeFile(rng,i))
+			count+=self.items
+		return count
+
+	def MakeFile (self,rng,fileIndex):
+		out=['<?xml version="1.0" encoding="UTF-8"?>\n',
+			'<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2"'
+			' xmlns:webct="http://www.webct.com/vista/assessment"'
+			' xmlns:d2l_2p0="http://desire2learn.com/xsd/d2lcp_v2p0">\n']
+		isAssessment=fileIndex%2==0
+		if isAssessment:
+			out.append('<assessment ident="A%03i" title="Assessment %i">\n'%(fileIndex,fileIndex))
+			out.append(self.MakeAssessmentMetadata(rng))
+		out.append('<section ident="S%03i" title="Section %i">\n'%(fileIndex,fileIndex))
+		for i in range(self.items):
+			kind=ITEM_KINDS[(fileIndex*self.items+i)%len(ITEM_KINDS)]
+			ident="I%03i_%04i"%(fileIndex,i)
+			out.append(getattr(self,"Make_"+kind)(rng,ident))
+		out.append('</section>\n')
+		if isAssessment:
+			out.append('</assessment>\n')
+		out.append('</questestinterop>\n')
+		return ''.join(out)
+
+	def MakeAssessmentMetadata (self,rng):
+		return ('<qtimetadata>\n'
+			'<qtimetadatafield><fieldlabel>wct_results_showFeedback</fieldlabel><fieldentry>true</fieldentry></qtimetadatafield>\n'
+			'<qtimetadatafield><fieldlabel>wct_attempt_attemptsAllowed</fieldlabel><fieldentry>%i</fieldentry></qtimetadatafield>\n'
+			'<qtimetadatafield><fieldlabel>wct_results_scoring</fieldlabel><fieldentry>First</fieldentry></qtimetadatafield>\n'
+			'<qtimetadatafield><fieldlabel>qmd_assessmenttype</fieldlabel><fieldentry>Examination</fieldentry></qtimetadatafield>\n'
+			'</qtimetadata>\n'
+			'<assess_procextension><d2l_2p0:time_limit>%i</d2l_2p0:time_limit>'
+			'<d2l_2p0:attempts_allowed>%i</d2l_2p0:attempts_allowed></assess_procextension>\n')%(
+			rng.randint(1,5),rng.randint(10,120),rng.randint(1,5))
+
+	def Words (self,rng,n):
+		return ' '.join(rng.choice(WORDS) for i in range(n))
+
+	def HTML (self,rng):
+		"""Returns the escaped HTML of a question, in a CDATA section or
+		with entity references"""
+		paras=[]
+		for i in range(self.html):
+			paras.append('<p>%s <b>%s</b> %s &amp; <i>%s</i>?</p>'%(self.Words(rng,12),self.Words(rng,2),
+				self.Words(rng,10),self.Words(rng,3)))
+		paras.append('<p><img src="img/figure%i.png" alt="%s"/></p>'%(rng.randrange(IMAGES),self.Words(rng,2)))
+		if rng.random()<0.5:
+			return '<![CDATA[%s]]>'%''.join(paras)
+		else:
+			return XMLText(''.join(paras))
+
+	def RTF (self,rng):
+		paras=[]
+		for i in range(self.html):
+			paras.append('%s {\\b %s} {\\i %s}\\par '%(self.Words(rng,10),self.Words(rng,2),self.Words(rng,3)))
+		text=''.join(c if ord(c)<128 else '\\u%i?'%ord(c) for c in ''.join(paras))
+		return ('{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0\\fswiss Arial;}{\\f1\\fcharset0 Times;}}'
+			'\\viewkind4\\uc1\\pard\\f0\\fs24 %s}'%text)
+
+	def Presentation (self,rng,response):
+		return ('<presentation><material><mattext texttype="text/html">%s</mattext></material>\n'
+			'%s</presentation>\n')%(self.HTML(rng),response)
+
+	def ItemMetadata (self,fields,bbType=None):
+		out=['<itemmetadata>']
+		if bbType:
+			out.append('<bbmd_asi_object_id>_%s_1</bbmd_asi_object_id><bbmd_questiontype>%s</bbmd_questiontype>'%(
+				fields[0][1],bbType))
+		out.append('<qtimetadata>')
+		for label,entry in fields:
+			out.append('<qtimetadatafield><fieldlabel>%s</fieldlabel><fieldentry>%s</fieldentry></qtimetadatafield>'%(label,entry))
+		out.append('</qtimetadata></itemmetadata>\n')
+		return ''.join(out)
+
+	def Labels (self,rng,n):
+		return ''.join('<response_label ident="%s"><material><mattext texttype="text/html">%s</mattext></material></response_label>\n'%(
+			chr(65+i),XMLText('<p>%s</p>'%self.Words(rng,rng.randint(2,8)))) for i in range(n))
+
+	def Make_choice (self,rng,ident):
+		n=rng.randint(3,6)
+		answer=chr(65+rng.randrange(n))
+		return ('<item ident="%s" title="Choice %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','Logical Identifier'),('qmd_weighting','1')])+
+			self.Presentation(rng,'<response_lid ident="R1" rcardinality="Single"><render_choice shuffle="Yes">\n%s</render_choice></response_lid>\n'%self.Labels(rng,n))+
+			'<resprocessing><outcomes><decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="1"/></outcomes>\n'
+			'<respcondition title="correct"><conditionvar><varequal respident="R1">%s</varequal></conditionvar>'
+			'<setvar action="Set" varname="SCORE">1</setvar><displayfeedback feedbacktype="Response" linkrefid="RIGHT"/></respcondition></resprocessing>\n'
+			'<itemfeedback ident="RIGHT"><material><mattext texttype="text/html">%s</mattext></material></itemfeedback>\n'
+			'</item>\n')%(answer,XMLText('<p>%s</p>'%self.Words(rng,6)))
+
+	def Make_multiple (self,rng,ident):
+		n=rng.randint(4,6)
+		conditions=''.join('<varequal respident="R1">%s</varequal>'%chr(65+i) for i in range(n) if rng.random()<0.5)
+		return ('<item ident="%s" title="Multiple %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','Logical Identifier')])+
+			self.Presentation(rng,'<response_lid ident="R1" rcardinality="Multiple"><render_choice shuffle="No">\n%s</render_choice></response_lid>\n'%self.Labels(rng,n))+
+			'<resprocessing><outcomes><decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="%i"/></outcomes>\n'
+			'<respcondition><conditionvar><and>%s</and></conditionvar><setvar action="Add" varname="SCORE">1</setvar></respcondition></resprocessing>\n'
+			'</item>\n')%(n,conditions or '<varequal respident="R1">A</varequal>')
+
+	def Make_fib (self,rng,ident):
+		answer=rng.choice(WORDS)
+		return ('<item ident="%s" title="FIB %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','String')])+
+			self.Presentation(rng,'<response_str ident="R1" rcardinality="Single"><render_fib fibtype="String" prompt="Box" columns="%i"/></response_str>\n'%rng.randint(5,40))+
+			'<resprocessing><outcomes><decvar/></outcomes>\n'
+			'<respcondition><conditionvar><varequal respident="R1" case="%s">%s</varequal></conditionvar><setvar action="Add">1</setvar></respcondition></resprocessing>\n'
+			'</item>\n')%(rng.choice(('Yes','No')),XMLText(answer))
+
+	def Make_numeric (self,rng,ident):
+		value=rng.uniform(-100,100)
+		return ('<item ident="%s" title="Numeric %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','Numerical')])+
+			self.Presentation(rng,'<response_num ident="R1" rcardinality="Single" numtype="Decimal"><render_fib fibtype="Decimal" columns="10"/></response_num>\n')+
+			'<resprocessing><outcomes><decvar varname="SCORE" vartype="Decimal"/></outcomes>\n'
+			'<respcondition><conditionvar><vargte respident="R1">%.2f</vargte><varlte respident="R1">%.2f</varlte></conditionvar>'
+			'<setvar action="Set" varname="SCORE">1</setvar></respcondition></resprocessing>\n'
+			'</item>\n')%(value-0.5,value+0.5)
+
+	def Make_hotspot (self,rng,ident):
+		x,y=rng.randint(0,60),rng.randint(0,60)
+		w,h=rng.randint(4,30),rng.randint(4,30)
+		shape=rng.choice(('Rectangle','Ellipse'))
+		return ('<item ident="%s" title="Hotspot %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','Logical Identifier')])+
+			('<presentation><material><matimage imagtype="image/png" uri="img/figure%i.png"/></material>\n'
+			'<response_xy ident="R1" rcardinality="Single"><render_hotspot>'
+			'<response_label ident="H1" rarea="%s">%i,%i,%i,%i</response_label>'
+			'<response_label ident="H2" rarea="Rectangle">0,0,4,4</response_label></render_hotspot></response_xy></presentation>\n')%(
+			rng.randrange(IMAGES),shape,x,y,w,h)+
+			'<resprocessing><outcomes><decvar/></outcomes><respcondition><conditionvar>'
+			'<varinside respident="R1" areatype="%s">%i,%i,%i,%i</varinside></conditionvar><setvar action="Set">1</setvar></respcondition></resprocessing>\n'
+			'</item>\n')%(shape,x,y,w,h)
+
+	def VarRange (self,rng):
+		low=rng.randint(1,50)
+		return low,low+rng.randint(1,50)
+
+	def Make_bb8calculated (self,rng,ident):
+		ranges=[self.VarRange(rng) for name in "xy"]
+		sets=[]
+		for i in range(rng.randint(2,6)):
+			x,y=[rng.randint(low,high) for low,high in ranges]
+			sets.append('<var_set ident="%s_%i"><var name="x">%i</var><var name="y">%i</var><answer>%i</answer></var_set>'%(
+				ident,i,x,y,x*y))
+		return ('<item ident="%s" title="Calculated %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_absolutescore_max','10.0')],'Calculated')+
+			self.Presentation(rng,'<response_num ident="R1" rcardinality="Single"><render_fib fibtype="Decimal"/></response_num>\n')+
+			'<itemproc_extension><calculated><formula>[x]*[y]</formula><answer_scale>2</answer_scale>'
+			'<answer_tolerance type="ABSOLUTE">0.1</answer_tolerance><vars>'+
+			''.join('<var name="%s" scale="0"><min>%i</min><max>%i</max></var>'%(name,low,high) for name,(low,high) in zip("xy",ranges))+
+			'</vars><var_sets>%s</var_sets></calculated></itemproc_extension>\n'
+			'</item>\n')%''.join(sets)
+
+	def Make_webctcalculated (self,rng,ident):
+		ranges=[self.VarRange(rng) for name in "ab"]
+		sets=[]
+		for i in range(rng.randint(2,6)):
+			a,b=[rng.randint(low,high) for low,high in ranges]
+			sets.append('<webct:calculated_set><webct:calculated_var webct:name="a" webct:value="%i"/>'
+				'<webct:calculated_var webct:name="b" webct:value="%i"/><webct:answer webct:value="%i"/></webct:calculated_set>'%(a,b,a+b))
+		return ('<item ident="%s" title="WebCT calculated %s">\n'%(ident,ident)+
+			self.ItemMetadata([('wct_questiontype','WCT_Calculated'),('wct_questioncategory','Synthetic')])+
+			self.Presentation(rng,'<response_str ident="R1" rcardinality="Single"><render_fib fibtype="String"/></response_str>\n')+
+			'<itemproc_extension><webct:calculated><webct:formula>{a}+{b}</webct:formula>'+
+			''.join('<webct:var webct:name="%s" webct:min="%i" webct:max="%i" webct:precision="0"/>'%(name,low,high) for name,(low,high) in zip("ab",ranges))+
+			'%s</webct:calculated></itemproc_extension>\n'
+			'</item>\n')%''.join(sets)
+
+	def Make_d2lcalculated (self,rng,ident):
+		low,high=self.VarRange(rng)
+		return ('<item ident="%s" title="D2L calculated %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','Numerical')])+
+			('<presentation><material><mattext texttype="text/html">%s</mattext>'
+			'<mat_extension><formula>{x}*2</formula><variable name="x"><minvalue>%i</minvalue><maxvalue>%i</maxvalue>'
+			'<decimalplaces>0</decimalplaces></variable></mat_extension></material>\n'
+			'<response_num ident="R1" rcardinality="Single"><render_fib fibtype="Decimal"/></response_num></presentation>\n')%(
+			self.HTML(rng),low,high)+
+			'</item>\n')
+
+	def Make_rtfessay (self,rng,ident):
+		return ('<item ident="%s" title="Essay %s">\n'%(ident,ident)+
+			self.ItemMetadata([('qmd_itemtype','String')])+
+			('<presentation><material><mattext texttype="text/rtf"><![CDATA[%s]]></mattext></material>\n'
+			'<response_str ident="R1" rcardinality="Single"><render_fib rows="%i" columns="60"/></response_str></presentation>\n')%(
+			self.RTF(rng),rng.randint(3,10))+
+			'</item>\n')
+
+
+def MakePNG (width,height,shade):
+	"""Returns the data of a small grey PNG image"""
+	def Chunk (kind,data):
+		return struct.pack('>I',len(data))+kind+data+struct.pack('>I',zlib.crc32(kind+data)&0xffffffff)
+	rows=b''.join(b'\x00'+bytes([(shade*29+x+y)&0xff for x in range(width)]) for y in range(height))
+	return (b'\x89PNG\r\n\x1a\n'+Chunk(b'IHDR',struct.pack('>IIBBBBB',width,height,8,0,0,0,0))+
+		Chunk(b'IDAT',zlib.compress(rows,9))+Chunk(b'IEND',b''))
+
+
+def ParseArguments (argv,generator):
+	"""Sets generator options from argv, returns the arguments left over"""
+	rest=[]
+	for x in argv:
+		if x[:7]=="--seed=":
+			generator.seed=int(x[7:])
+		elif x[:8]=="--files=":
+			generator.files=int(x[8:])
+		elif x[:8]=="--items=":
+			generator.items=int(x[8:])
+		elif x[:7]=="--html=":
+			generator.html=int(x[7:])
+		else:
+			rest.append(x)
+	return rest
+
+
+if __name__ == '__main__':
+	generator=CorpusGenerator()
+	args=ParseArguments(sys.argv[1:],generator)
+	if len(args)!=1 or args[0][:2]=="--":
+		print(__doc__)
+		sys.exit(1)
+	n=generator.Write(args[0])
+	print("%i files, %i items written to %s"%(generator.files,n,args[0]))
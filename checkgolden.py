@@ -0,0 +1,217 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+
+"""Golden output regression check for migrate.py
+
+Usage: checkgolden.py [--update] [--jobs=<n>] [--split] [--golden=<dir>]
+	[migrate.py options...] <corpus directory>
+
+Each QTI file, zip file or directory at the top of the corpus directory is
+a separate case and is converted by its own run of migrate.py (with
+--split the files inside directories become cases of their own too).  The
+content package made for each case is canonicalized and compared with the
+golden copy kept in the golden directory (<corpus directory>-golden by
+default), differences are shown as unified diffs and the exit status is 1
+if there were any.  With --update the golden copies are replaced instead.
+
+Canonicalization keeps imsmanifest.xml, the XML files in assessmentItems
+and assessmentTests and a list of all the files in the package.  The output
+is otherwise compared exactly, identifiers generated for objects without an
+ident depend only on the input (see --idseed) so they are checked too.
+
+Cases are independent so --jobs runs n of them at once, with --split this
+makes checking a large corpus cheap enough to do after every change.  Any
+other options are passed on to migrate.py, golden copies should always be
+made and checked with the same options."""
+
+import os, sys, difflib, shutil, tempfile, subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+MIGRATE=os.path.join(os.path.dirname(os.path.abspath(__file__)),"migrate.py")
+
+QTI_EXTENSIONS=('.xml','.dat','.qti','.zip')
+
+CANONICAL_DIRS=('assessmentItems','assessmentTests')
+
+FILE_LIST="files.txt"
+
+# Lines of diff shown for each file that differs
+MAX_DIFF_LINES=40
+
+
+def ListCases (corpus,split):
+	"""Returns the case names (paths relative to corpus) in sorted order"""
+	cases=[]
+	for name in sorted(os.listdir(corpus)):
+		path=os.path.join(corpus,name)
+		if os.path.isdir(path):
+			if split:
+				for dirPath,dirNames,fileNames in os.walk(path):
+					dirNames.sort()
+					for fileName in sorted(fileNames):
+						if fileName[-4:].lower() in QTI_EXTENSIONS:
+							cases.append(os.path.relpath(os.path.join(dirPath,fileName),corpus))
+			else:
+				cases.append(name)
+		elif name[-4:].lower() in QTI_EXTENSIONS:
+			cases.append(name)
+	return cases
+
+def ConvertCase (corpus,case,workDir,options):
+	"""Converts case with migrate.py, returns the output directory"""
+	outDir=os.path.join(workDir,"%s.out"%case.replace(os.sep,'_'))
+	args=[sys.executable,MIGRATE,"--nogui","--overwrite","--cpout="+outDir]+options+[os.path.join(corpus,case)]
+	p=subprocess.run(args,stdout=subprocess.DEVNULL,stderr=subprocess.PIPE)
+	if p.returncode:
+		raise RuntimeError("migrate.py failed on %s:\n%s"%(case,p.stderr.decode('utf-8','replace')))
+	return outDir
+
+def Canonicalize (outDir):
+	"""Returns a dictionary mapping canonical file names onto canonical text"""
+	files={}
+	try:
+		with open(os.path.join(outDir,"imsmanifest.xml"),encoding='utf-8') as f:
+			manifest=f.read()
+	except OSError:
+		return files
+	files["imsmanifest.xml"]=manifest
+	allFiles=[]
+	for dirPath,dirNames,fileNames in os.walk(outDir):
+		dirNames.sort()
+		for fileName in sorted(fileNames):
+			allFiles.append(os.path.relpath(os.path.join(dirPath,fileName),outDir).replace(os.sep,'/'))
+	files[FILE_LIST]=''.join(sorted(name+'\n' for name in allFiles))
+	for dirName in CANONICAL_DIRS:
+		dirPath=os.path.join(outDir,dirName)
+		if not os.path.isdir(dirPath):
+			continue
+		for fileName in os.listdir(dirPath):
+			if fileName.lower().endswith('.xml'):
+				with open(os.path.join(dirPath,fileName),encoding='utf-8') as f:
+					files[dirName+'/'+fileName]=f.read()
+	return files
+
+def ReadGolden (goldenDir):
+	files={}
+	for dirPath,dirNames,fileNames in os.walk(goldenDir):
+		for fileName in fileNames:
+			path=os.path.join(dirPath,fileName)
+			with open(path,encoding='utf-8') as f:
+				files[os.path.relpath(path,goldenDir).replace(os.sep,'/')]=f.read()
+	return files
+
+def WriteGolden (goldenDir,files):
+	shutil.rmtree(goldenDir,ignore_errors=True)
+	for name,text in files.items():
+		path=os.path.join(goldenDir,*name.split('/'))
+		os.makedirs(os.path.dirname(path),exist_ok=True)
+		with open(path,'w',encoding='utf-8',newline='') as f:
+			f.write(text)
+
+def DiffCase (case,golden,files):
+	"""Returns a list of lines describing the differences, empty if none"""
+	lines=[]
+	for name in sorted(set(golden)|set(files)):
+		if name not in files:
+			lines.append("%s: %s missing from output\n"%(case,name))
+		elif name not in golden:
+			lines.append("%s: %s not in golden output\n"%(case,name))
+		elif files[name]!=golden[name]:
+			diff=list(difflib.unified_diff(golden[name].splitlines(True),files[name].splitlines(True),
+				"golden/%s/%s"%(case,name),"output/%s/%s"%(case,name)))
+			if len(diff)>MAX_DIFF_LINES:
+				diff=diff[:MAX_DIFF_LINES]+["... (%i more lines)\n"%(len(diff)-MAX_DIFF_LINES)]
+			lines+=diff
+	return lines
+
+def CheckCase (corpus,case,goldenRoot,workDir,options,update):
+	outDir=ConvertCase(corpus,case,workDir,options)
+	try:
+		files=Canonicalize(outDir)
+	finally:
+		shutil.rmtree(outDir,ignore_errors=True)
+	goldenDir=os.path.join(goldenRoot,case)
+	if update:
+		WriteGolden(goldenDir,files)
+		return []
+	return DiffCase(case,ReadGolden(goldenDir),files)
+
+
+if __name__ == '__main__':
+	update=0
+	jobs=1
+	split=0
+	goldenRoot=None
+	options=[]
+	corpus=None
+	for x in sys.argv[1:]:
+		if x=="--update":
+			update=1
+		elif x[:7]=="--jobs=":
+			jobs=max(1,int(x[7:]))
+		elif x=="--split":
+			split=1
+		elif x[:9]=="--golden=":
+			goldenRoot=os.path.abspath(x[9:])
+		elif x=="--help":
+			corpus=None
+			break
+		elif x[:2]=="--":
+			options.append(x)
+		elif corpus is None:
+			corpus=os.path.abspath(x)
+		else:
+			corpus=None
+			break
+	if corpus is None or not os.path.isdir(corpus):
+		print(__doc__)
+		sys.exit(2)
+	if goldenRoot is None:
+		goldenRoot=corpus.rstrip(os.sep)+"-golden"
+	cases=ListCases(corpus,split)
+	workDir=tempfile.mkdtemp()
+	failed=0
+	try:
+		with ThreadPoolExecutor(jobs) as pool:
+			results=[pool.submit(CheckCase,corpus,case,goldenRoot,workDir,options,update) for case in cases]
+			for case,result in zip(cases,results):
+				lines=result.result()
+				if lines:
+					failed+=1
+					sys.stdout.write(''.join(lines))
+	finally:
+		shutil.rmtree(workDir,ignore_errors=True)
+	if update:
+		print("%i golden outputs written to %s"%(len(cases),goldenRoot))
+	else:
+		print("%i of %i cases differ from %s"%(failed,len(cases),goldenRoot))
+	sys.exit(1 if failed else 0)
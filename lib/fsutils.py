@@ -0,0 +1,316 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+import os
+import time
+import hashlib
+import zipfile
+import threading
+from shutil import copyfile, copyfileobj
+
+# Paths are ordinary file system paths except that a zip archive can stand in
+# for a directory: the path <archive>.zip/dir/file refers to the member
+# dir/file of the archive.  Only archives with a .zip extension are recognized.
+ARCHIVE_EXTENSION='.zip'
+
+# Open archives indexed by path, None for paths that aren't archives
+ARCHIVES={}
+ARCHIVES_LOCK=threading.Lock()
+
+HASH_BUFSIZE=1024*1024
+
+# Directory listings indexed by path, None for paths that can't be listed
+DIRECTORY_INDEX={}
+DIRECTORY_INDEX_LOCK=threading.Lock()
+
+class ZipArchive:
+	"""An index of the members of a zip archive, read once when opened"""
+	def __init__ (self,path):
+		self.path=path
+		# an open zip file can't be shared with a forked worker process
+		self.pid=os.getpid()
+		self.zf=zipfile.ZipFile(path,'r')
+		self.members={}
+		# directory listings are kept in the order of the archive
+		self.dirs={'':{}}
+		for info in self.zf.infolist():
+			name=self.NormalizeName(info.filename)
+			if name is None:
+				continue
+			if info.is_dir():
+				self.dirs.setdefault(name,{})
+				self.AddDirectory(name)
+			elif name not in self.members:
+				self.members[name]=info
+				self.AddDirectory(name)
+
+	@staticmethod
+	def NormalizeName (name):
+		"""Returns the '/' separated member name used in our index or None if
+		the member can't be named by a path within the archive"""
+		segments=[]
+		for segment in name.replace('\\','/').split('/'):
+			if segment=='..':
+				return None
+			elif segment and segment!='.':
+				segments.append(segment)
+		if segments:
+			return '/'.join(segments)
+		else:
+			return None
+
+	def AddDirectory (self,name):
+		"""Adds name to the listing of its parent directories"""
+		while name:
+			parent,discard,child=name.rpartition('/')
+			children=self.dirs.setdefault(parent,{})
+			if child in children:
+				break
+			children[child]=None
+			name=parent
+
+	def Exists (self,name):
+		return name in self.members or name in self.dirs
+
+	def IsDir (self,name):
+		return name in self.dirs
+
+	def ListDir (self,name):
+		if name not in self.dirs:
+			raise FileNotFoundError("No such directory in %s: %s"%(self.path,name))
+		return list(self.dirs[name])
+
+	def GetInfo (self,name):
+		info=self.members.get(name)
+		if info is None:
+			raise FileNotFoundError("No such file in %s: %s"%(self.path,name))
+		return info
+
+	def Open (self,name):
+		return self.zf.open(self.GetInfo(name),'r')
+
+	def Stat (self,name):
+		"""Returns the size and modification time (in ns) of a member"""
+		info=self.GetInfo(name)
+		mtime=time.mktime(info.date_time+(0,0,-1))
+		return info.file_size,int(mtime)*1000000000
+
+	def Close (self):
+		self.zf.close()
+
+
+class DirectoryIndex:
+	"""The names in a directory, listed once and then looked up in memory."""
+	def __init__ (self,path,names,links=()):
+		self.path=path
+		self.names=set(names)
+		# symbolic links may be broken, they are checked on every lookup
+		self.links=set(links)
+		# maps lower case names to real ones, built when first needed
+		self.lowerNames=None
+
+	def Contains (self,name):
+		return name in self.names
+
+	def Exists (self,name):
+		"""Returns true if name can be opened in the directory.  Names that
+		aren't listed are checked with the file system, which may find them
+		under another spelling (case, unicode normalization or short names)."""
+		if name in self.names and name not in self.links:
+			return 1
+		return os.path.exists(os.path.join(self.path or os.curdir,name))
+
+	def MatchName (self,name):
+		"""Returns the name in the directory that matches name, ignoring
+		case, or None if there isn't one.  Exact matches are preferred."""
+		if name in self.names:
+			return name
+		if self.lowerNames is None:
+			self.lowerNames={}
+			# sorted so that the choice between names differing only in
+			# case doesn't depend on the order of the listing
+			for n in sorted(self.names):
+				self.lowerNames.setdefault(n.lower(),n)
+		return self.lowerNames.get(name.lower())
+
+
+def GetArchive (path):
+	"""Returns the ZipArchive for the archive file at path, opening it if
+	necessary, or None if path is not a zip archive."""
+	with ARCHIVES_LOCK:
+		if path in ARCHIVES:
+			archive=ARCHIVES[path]
+			if archive is None or archive.pid==os.getpid():
+				return archive
+		archive=None
+		if path.lower().endswith(ARCHIVE_EXTENSION) and os.path.isfile(path):
+			try:
+				archive=ZipArchive(path)
+			except (OSError,zipfile.BadZipFile):
+				pass
+		ARCHIVES[path]=archive
+		return archive
+
+def SplitArchivePath (path):
+	"""Returns (archive,member name) or (None,path) if path isn't in an archive"""
+	# the name of the archive itself is the empty string
+	if ARCHIVE_EXTENSION+os.sep not in path.lower() and not path.lower().endswith(ARCHIVE_EXTENSION):
+		# the common case, no need to look any further
+		return None,path
+	start=0
+	lowerPath=path.lower()
+	while True:
+		i=lowerPath.find(ARCHIVE_EXTENSION,start)
+		if i<0:
+			return None,path
+		end=i+len(ARCHIVE_EXTENSION)
+		if end==len(path) or path[end]==os.sep:
+			archive=GetArchive(path[:end])
+			if archive is not None:
+				return archive,path[end+1:].replace(os.sep,'/')
+		start=end
+
+def IsArchive (path):
+	"""Returns true if path is a zip archive we can read from"""
+	return GetArchive(path) is not None
+
+def PathExists (path):
+	"""Returns true if there is a file or directory at path"""
+	# looked up in the parent's index so each directory is only listed once
+	archive,name=SplitArchivePath(path)
+	if archive is not None:
+		return not name or archive.Exists(name)
+	parent,name=os.path.split(path)
+	if name and name!=os.curdir and name!=os.pardir:
+		index=GetDirectoryIndex(parent)
+		if index is not None:
+			return index.Exists(name)
+	return os.path.exists(path)
+
+def GetDirectoryIndex (path):
+	"""Returns the DirectoryIndex of path, or None if it can't be listed"""
+	with DIRECTORY_INDEX_LOCK:
+		if path in DIRECTORY_INDEX:
+			return DIRECTORY_INDEX[path]
+	try:
+		archive,name=SplitArchivePath(path)
+		if archive is None:
+			names=[]
+			links=[]
+			with os.scandir(path or os.curdir) as entries:
+				for entry in entries:
+					names.append(entry.name)
+					if entry.is_symlink():
+						links.append(entry.name)
+			index=DirectoryIndex(path,names,links)
+		else:
+			index=DirectoryIndex(path,archive.ListDir(name))
+	except OSError:
+		index=None
+	with DIRECTORY_INDEX_LOCK:
+		return DIRECTORY_INDEX.setdefault(path,index)
+
+def ResetDirectoryIndex ():
+	"""Discards the directory listings indexed so far so that files created
+	or removed since they were read are seen by later lookups."""
+	with DIRECTORY_INDEX_LOCK:
+		DIRECTORY_INDEX.clear()
+
+def FindPathIgnoreCase (path):
+	"""Returns the path of an existing file that matches path when case is
+	ignored, or None if there is no such file.  Each component of path is
+	matched in turn, using the directory indexes."""
+	if PathExists(path):
+		return path
+	parent,name=os.path.split(path)
+	if not name or parent==path:
+		return None
+	if parent:
+		parent=FindPathIgnoreCase(parent)
+		if parent is None:
+			return None
+	index=GetDirectoryIndex(parent)
+	if index is None:
+		return None
+	name=index.MatchName(name)
+	if name is None:
+		return None
+	return os.path.join(parent,name)
+
+def PathIsDir (path):
+	"""Returns true if path is a directory, a zip archive or a directory
+	within an archive."""
+	archive,name=SplitArchivePath(path)
+	if archive is None:
+		return os.path.isdir(path)
+	return archive.IsDir(name)
+
+def ListDir (path):
+	archive,name=SplitArchivePath(path)
+	if archive is None:
+		return os.listdir(path)
+	return archive.ListDir(name)
+
+def OpenFile (path):
+	"""Opens the file at path for reading in binary mode"""
+	archive,name=SplitArchivePath(path)
+	if archive is None or not name:
+		return open(path,'rb')
+	return archive.Open(name)
+
+def GetFileStat (path):
+	"""Returns the size and modification time (in ns) of the file at path"""
+	archive,name=SplitArchivePath(path)
+	if archive is None or not name:
+		info=os.stat(path)
+		return info.st_size,info.st_mtime_ns
+	return archive.Stat(name)
+
+def GetFileHash (path):
+	"""Returns the hex SHA-256 digest of the data in the file at path"""
+	h=hashlib.sha256()
+	with OpenFile(path) as f:
+		while True:
+			data=f.read(HASH_BUFSIZE)
+			if not data:
+				break
+			h.update(data)
+	return h.hexdigest()
+
+def CopyFile (srcPath,dstPath):
+	"""Copies the file at srcPath to dstPath, streaming members of zip
+	archives straight from the archive."""
+	archive,name=SplitArchivePath(srcPath)
+	if archive is None or not name:
+		copyfile(srcPath,dstPath)
+	else:
+		with archive.Open(name) as src, open(dstPath,'wb') as dst:
+			copyfileobj(src,dst)
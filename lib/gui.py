@@ -235,6 +235,8 @@ class MyFrame(wx.Frame):
 		else:
 			print("No output set. Parsing complete")
 			self.SetStatusText("Parsing complete (dry run)")
+		parser.SummarizeWarnings()
+		parser.DumpStats()
 		parser=None
 
 	# ===============================
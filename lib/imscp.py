@@ -29,10 +29,42 @@ WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
 
 from lom import *
 from imsqti import QTIMetadata, InstructureMetadata
+from fsutils import *
+from logutils import *
 import io
 import os
-from shutil import copyfile
+import time
+from shutil import copyfileobj
 import codecs
+import tempfile
+import threading
+import concurrent.futures
+import zipfile
+import xml.etree.ElementTree
+try:
+	import fcntl
+except ImportError:
+	fcntl=None
+
+# Ways of placing media files in the package, see PlaceFile
+MEDIA_METHODS=('copy','hardlink','reflink')
+
+# ioctl request for cloning a file on copy-on-write file systems (Linux)
+FICLONE=0x40049409
+
+# Media that is already compressed is stored in zip packages as it is, there
+# is nothing to gain from deflating it again
+STORED_EXTENSIONS=frozenset((
+	'.jpg','.jpeg','.png','.gif','.webp',
+	'.mp3','.m4a','.aac','.ogg','.oga','.flac',
+	'.mp4','.m4v','.mov','.ogv','.webm','.swf',
+	'.zip','.gz','.bz2','.xz','.7z','.jar',
+	'.docx','.xlsx','.pptx','.odt','.ods','.odp'))
+
+ZIP_COPY_BUFSIZE=1024*1024
+
+# The number of media copies queued per copy thread, see CPFileCopier
+COPY_QUEUE_FACTOR=4
 
 IMSCP_NAMESPACE="http://www.imsglobal.org/xsd/imscp_v1p1"
 IMSMD_NAMESPACE="http://www.imsglobal.org/xsd/imsmd_v1p2"
@@ -47,15 +79,41 @@ class ContentPackage:
 		self.id=None
 		self.idSpace={}
 		self.fileSpace={}
+		# next suffix to try for each base identifier and file name
+		self.idNext={}
+		self.fileNext={}
+		# the file names allocated for each data hash
+		self.fileHashes={}
+		# the hashes of the data of files we've looked at, indexed by path
+		self.pathHashes={}
 		self.resources=[]
 		self.lom=None
+		self.streamPath=None
+		self.streamZip=None
+		self.streamErrorFiles=None
+		self.spool=None
+		# set to skip files that are already up to date when dumping
+		self.incremental=0
+		self.mediaMethod='copy'
+		# media files are copied in a pool of threads if copyJobs>1
+		self.copyJobs=1
+		self.copier=None
+		# records the time spent copying media, see SetStats
+		self.stats=None
 
 	def GetUniqueID (self,baseStr):
-		idStr=baseStr
-		idExtra=1
-		while idStr in self.idSpace:
-			idStr=baseStr+'-'+str(idExtra)
+		# identifiers are never released so there is no need to try the
+		# suffixes that we have already found taken for this baseStr
+		idExtra=self.idNext.get(baseStr,0)
+		while True:
+			if idExtra:
+				idStr=baseStr+'-'+str(idExtra)
+			else:
+				idStr=baseStr
+			if idStr not in self.idSpace:
+				break
 			idExtra=idExtra+1
+		self.idNext[baseStr]=idExtra
 		return idStr
 
 	def GetUniqueFileName (self,fName,dataHash=None, dont_save=False):
@@ -67,36 +125,158 @@ class ContentPackage:
 		stem=nameParts[0]
 		if not stem:
 			stem="file"
-		i=0
+		nameParts[0]=stem
+		baseName='.'.join(nameParts)
+		if dont_save: return baseName
+		# As with identifiers, we start at the first suffix not known to be taken
+		i=self.fileNext.get(baseName,0)
 		while True:
-			nameParts[0]=stem
 			if i:
 				nameParts[0]='%s-%i'%(stem,i)
 			else:
 				nameParts[0]=stem
 			fName='.'.join(nameParts)
-			if dont_save: return fName
-			if fName in self.fileSpace:
-				if dataHash and self.fileSpace[fName]==dataHash:
-					break
-				i+=1
-				continue
-			break
+			if fName not in self.fileSpace:
+				break
+			i+=1
+		self.fileNext[baseName]=i
+		if dataHash:
+			# an earlier name holding the same data wins over the free one
+			match=None
+			for hashName in self.fileHashes.get(dataHash,()):
+				j=self.FileNameSuffix(hashName,stem,nameParts[1:])
+				if j is not None and j<i and (match is None or j<match[0]):
+					match=(j,hashName)
+			if match:
+				return match[1]
+			self.fileHashes.setdefault(dataHash,[]).append(fName)
 		self.fileSpace[fName]=dataHash
 		return fName
 
+	def GetFileHash (self,path):
+		dataHash=self.pathHashes.get(path)
+		if dataHash is None:
+			dataHash=GetFileHash(path)
+			self.pathHashes[path]=dataHash
+		return dataHash
+
+	def GetHashFileName (self,dataHash):
+		# the first file name allocated to the same data, if any
+		names=self.fileHashes.get(dataHash)
+		if names:
+			return names[0]
+		return None
+
+	@staticmethod
+	def FileNameSuffix (fName,stem,extParts):
+		"""Returns i if fName is the i'th name GetUniqueFileName tries, or None"""
+		nameParts=fName.split(".")
+		if nameParts[1:]!=extParts:
+			return None
+		if nameParts[0]==stem:
+			return 0
+		prefix=stem+'-'
+		if nameParts[0].startswith(prefix):
+			suffix=nameParts[0][len(prefix):]
+			if suffix.isascii() and suffix.isdigit() and suffix[0]!='0':
+				return int(suffix)
+		return None
+
 	def AddResource (self,r):
 		if not r.id or r.id in self.idSpace:
 			r.AutoSetID(self)
 		self.idSpace[r.id]=r
 		self.resources.append(r)
 
+	def MergePackage (self,cp):
+		"""Adds the resources of cp unless its names clash with ours, returns 1 if merged"""
+		for id in cp.idSpace:
+			if id in self.idSpace:
+				return 0
+		for fName in cp.fileSpace:
+			if fName in self.fileSpace:
+				return 0
+		for dataHash in cp.fileHashes:
+			# the data might have been shared with one of our files
+			if dataHash in self.fileHashes:
+				return 0
+		self.idSpace.update(cp.idSpace)
+		self.fileSpace.update(cp.fileSpace)
+		self.fileHashes.update(cp.fileHashes)
+		self.resources.extend(cp.resources)
+		if cp.lom and cp.lom.general:
+			for desc in cp.lom.general.description:
+				self.GetLOM().GetGeneral().AddDescription(desc)
+		for r in cp.resources:
+			self.FlushResource(r)
+		return 1
+
+	def SetIncremental (self,incremental):
+		self.incremental=incremental
+
+	def SetMediaMethod (self,mediaMethod):
+		self.mediaMethod=mediaMethod
+
+	def SetCopyJobs (self,copyJobs):
+		self.copyJobs=copyJobs
+
+	def SetStats (self,stats):
+		self.stats=stats
+
+	def GetCopier (self):
+		if self.copier is None and self.copyJobs>1:
+			self.copier=CPFileCopier(self.copyJobs)
+		return self.copier
+
+	def FinishCopies (self):
+		if self.copier is not None:
+			copier=self.copier
+			self.copier=None
+			if self.stats:
+				self.stats.EnterPhase('media')
+			try:
+				copier.Finish()
+			finally:
+				if self.stats:
+					self.stats.ExitPhase()
+
+	def SetStreamPath (self,path,create_error_files=None):
+		# flushed resources are written to path and their manifest entries spooled
+		self.streamPath=path
+		self.streamErrorFiles=create_error_files
+		if path:
+			self.PrepareDirectory(path)
+			if self.spool is None:
+				self.spool=tempfile.TemporaryFile('w+',encoding='utf-8',newline='')
+
+	def SetStreamZip (self,zipPath,create_error_files=None):
+		# as SetStreamPath, DumpToZip must be called with the same path to finish
+		self.streamZip=CPZipArchive(zipPath)
+		self.streamErrorFiles=create_error_files
+		if self.spool is None:
+			self.spool=tempfile.TemporaryFile('w+',encoding='utf-8',newline='')
+
+	def FlushResource (self,r):
+		"""Called when resource r is complete, no more files will be added to it."""
+		if self.streamPath or self.streamZip:
+			if self.streamZip:
+				r.StreamToZip(self.streamZip,self.streamErrorFiles,self.stats)
+			else:
+				r.StreamToDirectory(self.streamPath,self.streamErrorFiles,self.incremental,self.mediaMethod,self.GetCopier(),self.stats)
+			r.WriteManifestXML(self.spool)
+			# we only need to remember that the identifier is taken
+			self.idSpace[r.id]=None
+			if self.resources and self.resources[-1] is r:
+				del self.resources[-1]
+			else:
+				self.resources.remove(r)
+
 	def GetLOM (self):
 		if not self.lom:
 			self.lom=LOM()
 		return self.lom
 
-	def DumpToDirectory (self,path, create_error_files=None):
+	def PrepareDirectory (self,path):
 		if not os.path.exists(path):
 			os.makedirs(path)
 		temp_path = os.path.join(path,"assessmentTests")
@@ -106,13 +286,61 @@ class ContentPackage:
 		if not os.path.exists(temp_path):
 			os.mkdir(temp_path)
 		assert os.path.isdir(path)
+
+	def DumpToDirectory (self,path, create_error_files=None):
+		self.PrepareDirectory(path)
 		manifestPath=os.path.join(path,'imsmanifest.xml')
-		f=codecs.open(manifestPath,'w', "utf8")
-		print("Writing manifest file: "+manifestPath)
-		self.WriteManifestXML(f)
-		f.close()
+		if self.incremental:
+			oldFiles=ReadManifestFiles(manifestPath)
+			f=io.StringIO()
+			self.WriteManifestXML(f)
+			manifest=f.getvalue()
+			data=manifest.encode('utf-8')
+			if FileHasData(manifestPath,data):
+				LogInfo("Manifest file unchanged: "+manifestPath)
+			else:
+				LogInfo("Writing manifest file: "+manifestPath)
+				with open(manifestPath,'wb') as f:
+					f.write(data)
+		else:
+			f=codecs.open(manifestPath,'w', "utf8")
+			LogInfo("Writing manifest file: "+manifestPath)
+			self.WriteManifestXML(f)
+			f.close()
+		copier=self.GetCopier()
 		for r in self.resources:
-			r.DumpToDirectory(path, create_error_files)
+			r.DumpToDirectory(path, create_error_files, self.incremental, self.mediaMethod, copier, self.stats)
+		self.FinishCopies()
+		if self.incremental:
+			self.RemoveStaleFiles(path,oldFiles,ReadManifestFiles(io.BytesIO(data)))
+
+	def DumpToZip (self,zipPath,create_error_files=None):
+		if self.streamZip:
+			zf=self.streamZip
+			self.streamZip=None
+		else:
+			zf=CPZipArchive(zipPath)
+		try:
+			f=io.StringIO()
+			self.WriteManifestXML(f)
+			LogInfo("Writing manifest file: "+zf.GetEntryPath('imsmanifest.xml'))
+			zf.WriteData('imsmanifest.xml',f.getvalue().encode('utf-8'))
+			for r in self.resources:
+				r.DumpToZip(zf,create_error_files,self.stats)
+		finally:
+			zf.Close()
+
+	def RemoveStaleFiles (self,path,oldFiles,newFiles):
+		keep=set()
+		for href in newFiles:
+			if RelativeURL(href):
+				keep.add(ResolveCPURI(path,href))
+		for href in sorted(oldFiles):
+			if RelativeURL(href):
+				filepath=ResolveCPURI(path,href)
+				if filepath not in keep and os.path.isfile(filepath):
+					LogInfo("Removing file: "+filepath)
+					os.remove(filepath)
 
 	def WriteManifestXML (self,f):
 		f.write('<?xml version="1.0"?>')
@@ -131,10 +359,17 @@ class ContentPackage:
 			self.lom.WriteIMSXML(f,"imsmd:")
 			f.write('\n</metadata>')
 		f.write('\n<organizations/>')
-		if self.resources:
+		if self.resources or (self.spool and self.spool.tell()):
 			f.write('\n<resources>')
+			# resources that were never flushed are written first, they are
+			# typically the ones created from an input imsmanifest.xml
 			for r in self.resources:
 				r.WriteManifestXML(f)
+			if self.spool:
+				end=self.spool.tell()
+				self.spool.seek(0)
+				copyfileobj(self.spool,f)
+				self.spool.seek(end)
 			f.write('\n</resources>')
 		f.write('\n</manifest>')
 
@@ -217,9 +452,25 @@ class CPResource:
 			cpf.href = dest_path
 			cpf.dataPath = data_path
 
-	def DumpToDirectory (self,path,create_error_files=None):
+	def DumpToDirectory (self,path,create_error_files=None,incremental=0,mediaMethod='copy',copier=None,stats=None):
+		for f in self.files:
+			f.DumpToDirectory(path,create_error_files,incremental,mediaMethod,copier,stats)
+
+	def StreamToDirectory (self,path,create_error_files=None,incremental=0,mediaMethod='copy',copier=None,stats=None):
+		for f in self.files:
+			f.DumpToDirectory(path,create_error_files,incremental,mediaMethod,copier,stats)
+			f.data=None
+			f.streamed=1
+
+	def DumpToZip (self,zf,create_error_files=None,stats=None):
+		for f in self.files:
+			f.DumpToZip(zf,create_error_files,stats)
+
+	def StreamToZip (self,zf,create_error_files=None,stats=None):
 		for f in self.files:
-			f.DumpToDirectory(path,create_error_files)
+			f.DumpToZip(zf,create_error_files,stats)
+			f.data=None
+			f.streamed=1
 
 	def WriteManifestXML (self,f):
 		f.write('\n\t<resource identifier="'+self.id+'"')
@@ -252,6 +503,10 @@ class CPFile:
 		self.lom=None
 		self.data=None
 		self.dataPath=None
+		# set once the file has been written by a streaming package
+		self.streamed=0
+		# set if the data is written by another CPFile with the same href
+		self.shared=0
 
 	def SetHREF (self,href):
 		self.href=href
@@ -262,26 +517,73 @@ class CPFile:
 	def SetDataPath (self,dataPath):
 		self.dataPath=dataPath
 
-	def DumpToDirectory (self,path,create_error_files=None):
+	def SetShared (self,shared):
+		self.shared=shared
+
+	def DumpToDirectory (self,path,create_error_files=None,incremental=0,mediaMethod='copy',copier=None,stats=None):
+		if self.streamed or self.shared:
+			return
 		if RelativeURL(self.href):
 			filepath=ResolveCPURI(path,self.href)
-			print("Writing file: "+filepath)
+			if incremental:
+				# leave files that are already up to date alone
+				if self.dataPath is None:
+					if FileHasData(filepath,self.data.encode('utf-8')):
+						return
+				elif FileIsCopy(filepath,self.dataPath):
+					return
+			LogInfo("Writing file: "+filepath)
 			if self.dataPath is None:
 				f=codecs.open(filepath,'w', "utf8")
 				f.write(self.data)
 				f.close()
-			else:
-				try:
-					dir = os.path.split(filepath)[0]
-					if not os.path.exists(dir):
-						os.makedirs(dir)
-					copyfile(self.dataPath,filepath)
-				except IOError:
-					print('Problem copying "%s" -> "%s"'%(self.dataPath,filepath))
-					if create_error_files:
-						f=codecs.open(filepath,'w',"utf8")
-						f.write("Data Missing\n")
-						f.close()
+				return
+			if stats:
+				stats.EnterPhase('media')
+			try:
+				if copier is not None:
+					# the copier reports any problem when it finishes
+					try:
+						os.makedirs(os.path.split(filepath)[0],exist_ok=True)
+					except OSError:
+						pass
+					copier.Copy(self.dataPath,filepath,mediaMethod,create_error_files)
+				else:
+					try:
+						dir = os.path.split(filepath)[0]
+						if not os.path.exists(dir):
+							os.makedirs(dir)
+						PlaceFile(self.dataPath,filepath,mediaMethod)
+					except IOError:
+						LogError('Problem copying "%s" -> "%s"'%(self.dataPath,filepath))
+						if create_error_files:
+							WriteErrorFile(filepath)
+			finally:
+				if stats:
+					stats.ExitPhase()
+
+	def DumpToZip (self,zf,create_error_files=None,stats=None):
+		if self.streamed or self.shared:
+			return
+		if RelativeURL(self.href):
+			name=ZipEntryName(self.href)
+			if zf.HasEntry(name):
+				return
+			LogInfo("Writing file: "+zf.GetEntryPath(name))
+			if self.dataPath is None:
+				zf.WriteData(name,self.data.encode('utf-8'))
+				return
+			if stats:
+				stats.EnterPhase('media')
+			try:
+				zf.WriteFile(name,self.dataPath)
+			except IOError:
+				LogError('Problem copying "%s" -> "%s"'%(self.dataPath,zf.GetEntryPath(name)))
+				if create_error_files:
+					zf.WriteData(name,b"Data Missing\n")
+			finally:
+				if stats:
+					stats.ExitPhase()
 
 	def WriteResourceHREF (self,f):
 		if self.href:
@@ -301,6 +603,167 @@ class CPFile:
 		else:
 			f.write('/>')
 
+def PlaceFile (srcPath,dstPath,method='copy'):
+	# links and clones fall back to copying, e.g. across file systems
+	if os.path.realpath(srcPath)==os.path.realpath(dstPath):
+		# the package is being written over its own input
+		return
+	# the file is placed under a temporary name and then moved over dstPath,
+	# so we never write through an existing link to someone else's data and
+	# a failure leaves whatever was at dstPath in place
+	dstDir,dstName=os.path.split(dstPath)
+	tmpPath=os.path.join(dstDir,".%s.%i-%i.tmp"%(dstName,os.getpid(),threading.get_ident()))
+	if os.path.lexists(tmpPath):
+		os.remove(tmpPath)
+	try:
+		placed=0
+		if method!='copy':
+			try:
+				if method=='hardlink':
+					os.link(srcPath,tmpPath)
+					placed=1
+				elif method=='reflink' and fcntl is not None:
+					with open(srcPath,'rb') as src, open(tmpPath,'wb') as dst:
+						fcntl.ioctl(dst.fileno(),FICLONE,src.fileno())
+					placed=1
+			except OSError:
+				pass
+		if not placed:
+			CopyFile(srcPath,tmpPath)
+		os.replace(tmpPath,dstPath)
+	except:
+		if os.path.lexists(tmpPath):
+			os.remove(tmpPath)
+		raise
+
+class CPFileCopier:
+	"""Places media files in a package using a pool of threads"""
+	def __init__ (self,jobs):
+		self.executor=concurrent.futures.ThreadPoolExecutor(jobs)
+		self.slots=threading.BoundedSemaphore(jobs*COPY_QUEUE_FACTOR)
+		self.lock=threading.Lock()
+		self.failures=[]
+		self.errors=[]
+		# the source and future of the last copy to each destination
+		self.copies={}
+
+	def Copy (self,srcPath,dstPath,method='copy',create_error_files=None):
+		if dstPath in self.copies:
+			lastSrcPath,lastCopy=self.copies[dstPath]
+			if lastSrcPath==srcPath:
+				return
+			lastCopy.result()
+		self.slots.acquire()
+		try:
+			self.copies[dstPath]=(srcPath,self.executor.submit(self.RunCopy,srcPath,dstPath,method,create_error_files))
+		except:
+			self.slots.release()
+			raise
+
+	def RunCopy (self,srcPath,dstPath,method,create_error_files):
+		try:
+			try:
+				PlaceFile(srcPath,dstPath,method)
+			except IOError:
+				with self.lock:
+					self.failures.append((srcPath,dstPath))
+				if create_error_files:
+					WriteErrorFile(dstPath)
+		except Exception as err:
+			# re-raised by Finish
+			with self.lock:
+				self.errors.append(err)
+		finally:
+			self.slots.release()
+
+	def Finish (self):
+		self.executor.shutdown(wait=True)
+		for srcPath,dstPath in self.failures:
+			LogError('Problem copying "%s" -> "%s"'%(srcPath,dstPath))
+		if self.failures:
+			LogWarning("Warning: %i file(s) could not be copied"%len(self.failures))
+		self.failures=[]
+		self.copies={}
+		if self.errors:
+			raise self.errors[0]
+
+class CPZipArchive:
+	"""A zip archive that a content package is written to"""
+	def __init__ (self,path):
+		self.path=path
+		self.zf=zipfile.ZipFile(path,'w',zipfile.ZIP_DEFLATED)
+		self.names=set()
+
+	def GetEntryPath (self,name):
+		return self.path+'/'+name
+
+	def HasEntry (self,name):
+		return name in self.names
+
+	def WriteData (self,name,data):
+		self.names.add(name)
+		self.zf.writestr(name,data,compress_type=ZipCompression(name))
+
+	def WriteFile (self,name,srcPath):
+		size,mtime=GetFileStat(srcPath)
+		# zip files can't represent times before 1980
+		dateTime=max(time.localtime(mtime//1000000000)[:6],(1980,1,1,0,0,0))
+		info=zipfile.ZipInfo(name,dateTime)
+		info.compress_type=ZipCompression(name)
+		info.external_attr=0o644<<16
+		info.file_size=size
+		with OpenFile(srcPath) as src:
+			# the name is taken even if the copy fails part way through
+			self.names.add(name)
+			with self.zf.open(info,'w') as dst:
+				copyfileobj(src,dst,ZIP_COPY_BUFSIZE)
+
+	def Close (self):
+		self.zf.close()
+
+def ZipCompression (name):
+	if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+		return zipfile.ZIP_STORED
+	else:
+		return zipfile.ZIP_DEFLATED
+
+def ZipEntryName (href):
+	return ResolveCPURI('',href).replace(os.sep,'/')
+
+def WriteErrorFile (path):
+	f=codecs.open(path,'w',"utf8")
+	f.write("Data Missing\n")
+	f.close()
+
+def FileHasData (path,data):
+	try:
+		if os.path.getsize(path)!=len(data):
+			return 0
+		with open(path,'rb') as f:
+			return f.read()==data
+	except OSError:
+		return 0
+
+def FileIsCopy (path,srcPath):
+	# same size and modified no earlier than srcPath
+	try:
+		info=os.stat(path)
+		srcSize,srcMTime=GetFileStat(srcPath)
+	except OSError:
+		return 0
+	return info.st_size==srcSize and info.st_mtime_ns>=srcMTime
+
+def ReadManifestFiles (manifest):
+	# manifest is a path or file object, which need not exist
+	hrefs=set()
+	try:
+		for event,element in xml.etree.ElementTree.iterparse(manifest):
+			if element.tag=='{%s}file'%IMSCP_NAMESPACE and element.get('href'):
+				hrefs.add(element.get('href'))
+	except (OSError,xml.etree.ElementTree.ParseError):
+		pass
+	return hrefs
+
 def ResolveCPURI (cpPath,uri):
 	walk=0
 	path=cpPath
@@ -312,7 +775,7 @@ def ResolveCPURI (cpPath,uri):
 			if walk:
 				path,discard=os.path.split(path)
 				walk=walk-1
-			print("Warning: relative URL tried to leave the CP directory")
+			LogWarning("Warning: relative URL tried to leave the CP directory")
 		else:
 			walk=walk+1
 			path=os.path.join(path,DecodePathSegment(segment))
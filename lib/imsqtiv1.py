@@ -35,10 +35,17 @@ MIGRATION_VERSION="Version: 2008-06-??"
 from types import *
 import string
 import os, sys, re
+import multiprocessing
+import copy
+import hashlib
+import pickle
+import tempfile
+import time
+import json
+import csv
 from xml.sax import handler, SAXParseException
 from lxml import etree, sax
 import io
-from random import randint
 try:
 	import vobject
 	GOT_VOBJECT=1
@@ -52,6 +59,8 @@ CURRENT_FILE_NAME=None
 
 from iso8601 import *
 from xmlutils import *
+from fsutils import *
+from logutils import *
 from rtfutils import *
 from lom import *
 from imscp import *
@@ -72,8 +81,23 @@ class QTIParserV1Options:
 		self.noComment=0
 		self.dtdDir=''
 		self.cpPath=''
+		self.cpZip=''
 		self.prepend_path=None
 		self.create_error_files=None
+		self.jobs=1
+		self.stream=0
+		self.lowmem=0
+		self.cacheDir=''
+		self.incremental=0
+		self.mediaMethod='copy'
+		self.copyJobs=1
+		self.dedupMedia=0
+		self.fixCase=0
+		self.statsPath=''
+		self.logLevel=LOG_INFO
+		self.logJSON=0
+		self.logRepeat=0
+		self.idSeed=''
 
 
 # QTIException Class
@@ -117,6 +141,36 @@ VIEWMAP={'administrator':'invigilator','adminauthority':'invigilator',
 
 D2L_IDENTIFIER_REPLACER = re.compile(r'_(?:ans|str)$', flags=re.I)
 
+# Warning messages are recorded as (code,args) pairs, code identifies the
+# message template in WARNING_TEMPLATES and the text is only made (by
+# formatting the template with args) when it is written out
+WARNING_TEMPLATES=[]
+WARNING_CODES={}
+
+def GetWarningCode (template):
+	code=WARNING_CODES.get(template)
+	if code is None:
+		code=WARNING_CODES[template]=len(WARNING_TEMPLATES)
+		WARNING_TEMPLATES.append(template)
+	return code
+
+# Matches the parameters in a template, these are elided in summaries
+WARNING_PARAMETER=re.compile('%[-#0 +]*[0-9]*(?:\\.[0-9]+)?[diouxXeEfFgGcrsa]')
+
+def FormatWarning (template,args=()):
+	if args:
+		return template%args
+	else:
+		return template
+
+def FormatWarnings (warnings):
+	"""Returns the text of a list of (code,args) warnings, one per line"""
+	return ''.join(FormatWarning(WARNING_TEMPLATES[code],args)+'\n' for code,args in warnings)
+
+# Maps each QTIObjectV1 class onto a dictionary of attribute handlers, filled
+# in by ParseAttributes as attribute names are first seen
+ATTRIBUTE_HANDLERS={}
+
 #
 # QTIObjectV1
 #
@@ -126,18 +180,29 @@ class QTIObjectV1:
 		self.ParseAttributes(attrs)
 
 	def ParseAttributes (self,attrs):
+		handlers=ATTRIBUTE_HANDLERS.get(self.__class__)
+		if handlers is None:
+			handlers=ATTRIBUTE_HANDLERS[self.__class__]={}
 		for aName in attrs.keys():
-			if aName[:4]=='xml:':
-				f=getattr(self,'SetAttribute_xml_'+aName[4:],0)
-			elif aName[:6]=='webct:':
-				f=getattr(self,'SetAttribute_webct_'+aName[6:],0)
-			else:
-				f=getattr(self,'SetAttribute_'+aName,0)
+			try:
+				f=handlers[aName]
+			except KeyError:
+				f=handlers[aName]=self.GetAttributeHandler(aName)
 			if f:
-				f(attrs[aName])
+				f(self,attrs[aName])
 			elif not (aName=='xmlns' or ':' in aName):
 				# suppress warnings about any schema or namespace magic
-				print("Unknown or unsupported attribute: "+aName)
+				LogWarning("Unknown or unsupported attribute: "+aName)
+
+	@classmethod
+	def GetAttributeHandler (cls,aName):
+		"""Returns the (unbound) method that sets attribute aName or None"""
+		if aName[:4]=='xml:':
+			return getattr(cls,'SetAttribute_xml_'+aName[4:],None)
+		elif aName[:6]=='webct:':
+			return getattr(cls,'SetAttribute_webct_'+aName[6:],None)
+		else:
+			return getattr(cls,'SetAttribute_'+aName,None)
 
 	def ReadYesNo (self,value,default):
 		if value.lower()=="yes":
@@ -145,29 +210,29 @@ class QTIObjectV1:
 		elif value.lower()=="no":
 			return 0
 		else:
-			print('Warning: bad value for yes/no, ignoring "'+value+'"')
+			LogWarning('Warning: bad value for yes/no, ignoring "'+value+'"')
 
 	def ReadFloat (self,value,default):
 		try:
 			return float(value)
 		except:
-			print('Warning: bad number for attribute, ignoring "'+value+'"')
+			LogWarning('Warning: bad number for attribute, ignoring "'+value+'"')
 			return default
 
 	def ReadInteger (self,value,default):
 		try:
 			return int(value)
 		except:
-			print('Warning: bad integer for attribute, ignoring "'+value+'"')
+			LogWarning('Warning: bad integer for attribute, ignoring "'+value+'"')
 			return default
 
 	def ReadIdentifier (self,value,prefix="ID-"):
 		value=self.CheckNMTOKEN(value.strip(),prefix)
 		if ":" in value:
-			self.PrintWarning('Warning: removing colon from identifier "%s"'%value)
+			self.PrintWarning('Warning: removing colon from identifier "%s"',args=(value,))
 			value=value.replace(':','_')
 		if "." in value:
-			self.PrintWarning('Warning: removing period from identifier "%s"'%value)
+			self.PrintWarning('Warning: removing period from identifier "%s"',args=(value,))
 			value=value.replace('.','_')
 		return value
 
@@ -189,9 +254,9 @@ class QTIObjectV1:
 				newtoken=prefix
 			newtoken=newtoken+c
 		if unchecked:
-			self.PrintWarning('Warning: couldn\'t check NMTOKEN with non-ascii character(s): "%s"'%token)
+			self.PrintWarning('Warning: couldn\'t check NMTOKEN with non-ascii character(s): "%s"',args=(token,))
 		if bad:
-			self.PrintWarning('Warning: replacing bad NMTOKEN "%s" with "%s"'%(token,newtoken))
+			self.PrintWarning('Warning: replacing bad NMTOKEN "%s" with "%s"',args=(token,newtoken))
 		return newtoken
 
 	def ReadView (self,value):
@@ -200,10 +265,10 @@ class QTIObjectV1:
 			if view in VIEWMAP:
 				new_view=VIEWMAP[view]
 				if new_view!=view:
-					self.PrintWarning('Warning: changing '+view+' to '+new_view)
+					self.PrintWarning('Warning: changing %s to %s',args=(view,new_view))
 				view=new_view
 			else:
-				self.PrintWarning('Warning: ignoring unknown view ('+view+')')
+				self.PrintWarning('Warning: ignoring unknown view (%s)',args=(view,))
 		return view
 
 	def ConvertAreaCoords (self,shape,value):
@@ -248,31 +313,46 @@ class QTIObjectV1:
 	def AddData (self,data):
 		data=data.strip()
 		if data:
-			print("Ignoring data: "+XMLString(data))
+			LogWarning("Ignoring data: "+XMLString(data))
 
 	def CloseObject (self):
 		pass
 
+	# The objects found by walking up the parent chain are remembered, a
+	# parent may be replaced during construction but only by a new object
+	# with the same ancestors so the results never change.
+	rootObject=None
+	itemObject=None
+	mdContainer=None
+	helperContainer=None
+
 	def GetRoot (self):
-		if not self.parent:
-			return self
-		else:
-			return self.parent.GetRoot()
+		if self.rootObject is None:
+			if not self.parent:
+				return self
+			self.rootObject=self.parent.GetRoot()
+		return self.rootObject
 
 	def GetParser (self):
 		return self.GetRoot().parser
 
 	def GetItemV1 (self):
-		assert self.parent,QTIException(eNoParentItem)
-		return self.parent.GetItemV1()
+		if self.itemObject is None:
+			assert self.parent,QTIException(eNoParentItem)
+			self.itemObject=self.parent.GetItemV1()
+		return self.itemObject
 
 	def GetMDContainer(self):
-		assert self.parent,QTIException(eNoParentMDContainer)
-		return self.parent.GetMDContainer()
+		if self.mdContainer is None:
+			assert self.parent,QTIException(eNoParentMDContainer)
+			self.mdContainer=self.parent.GetMDContainer()
+		return self.mdContainer
 
 	def GetInstructureHelperContainer(self):
-		assert self.parent,QTIException(eNoParentMDContainer)
-		return self.parent.GetInstructureHelperContainer()
+		if self.helperContainer is None:
+			assert self.parent,QTIException(eNoParentMDContainer)
+			self.helperContainer=self.parent.GetInstructureHelperContainer()
+		return self.helperContainer
 
 	def SniffRenderHotspot (self):
 		if self.parent:
@@ -280,18 +360,18 @@ class QTIObjectV1:
 		else:
 			return None
 
-	def PrintWarning (self, warning, force=0):
+	def PrintWarning (self, warning, force=0, args=()):
 		if not self.parent:
-			print(warning)
+			LogWarning(FormatWarning(warning,args))
 		else:
-			self.parent.PrintWarning(warning,force)
+			self.parent.PrintWarning(warning,force,args)
 
 	def CheckLocation (self, expected_parents, tag, do_assert=True):
 		if not isinstance(self.parent, expected_parents):
 			if do_assert:
 				raise QTIException(eInvalidStructure,tag)
 			else:
-				print("Tag (%s) in unexpected location - parent: (%s)" % (tag, self.parent))
+				LogWarning("Tag (%s) in unexpected location - parent: (%s)" % (tag, self.parent))
 			return False
 		return True
 
@@ -393,7 +473,7 @@ class Unsupported(QTIObjectV1):
 	def __init__(self,name,attrs,parent):
 		self.parent=parent
 		if not isinstance(parent,Unsupported):
-			print("Unsupported element <"+name+">")
+			LogWarning("Unsupported element <"+name+">")
 
 	def AddData (self,data):
 		pass
@@ -426,6 +506,8 @@ class QuesTestInterop(QTIObjectV1):
 		self.cp=None
 		self.parser=None
 		self.resources=[]
+		# a resource that is complete but not yet flushed, see FlushResource
+		self.heldResource=None
 		self.description=None
 
 	def SetCP (self,cp):
@@ -453,6 +535,21 @@ class QuesTestInterop(QTIObjectV1):
 		self.resources.append(resource)
 		self.cp.AddResource(resource)
 
+	def FlushResource (self,resource):
+		# If it turns out to be our only resource our qticomment becomes its
+		# metadata so the first resource is held back until we know
+		if self.heldResource is None and len(self.resources)==1 and resource is self.resources[0]:
+			self.heldResource=resource
+			return
+		self.FlushHeldResource()
+		self.cp.FlushResource(resource)
+
+	def FlushHeldResource (self):
+		if self.heldResource is not None:
+			resource=self.heldResource
+			self.heldResource=None
+			self.cp.FlushResource(resource)
+
 	def AddSection (self,id):
 		pass
 
@@ -477,6 +574,7 @@ class QuesTestInterop(QTIObjectV1):
 			self.resources[0].GetLOM().GetGeneral().AddDescription(self.description)
 		elif self.description:
 			self.cp.GetLOM().GetGeneral().AddDescription(self.description)
+		self.FlushHeldResource()
 
 
 # QTIComment
@@ -1338,14 +1436,13 @@ class QTIAssessment(InstructureHelperContainer):
 		self.educationalMetadata=None
 		self.variables={'FEEDBACK':None}
 		self.warnings={}
-		self.msg=""
 		self.ParseAttributes(attrs)
 		if not self.assessment.identifier and CURRENT_FILE_NAME:
 			self.SetAttribute_ident(CURRENT_FILE_NAME)
 		elif not self.assessment.identifier:
-			self.SetAttribute_ident("%s" % randint(1,100000))
+			self.SetAttribute_ident(self.parser.GenerateIdentifier())
 		if 'ident' in attrs:
-			print('-- Converting item id="'+attrs['ident']+'" --')
+			LogInfo('-- Converting item id="'+attrs['ident']+'" --')
 		if not self.assessment.language and self.parser.options.lang:
 			self.assessment.SetLanguage(self.parser.options.lang)
 		# Set the name of the file
@@ -1358,7 +1455,7 @@ class QTIAssessment(InstructureHelperContainer):
 	def SetAttribute_ident (self,value):
 		if self.assessment.identifier: return
 		if ':' in value:
-			print("Warning: assessment identifier with colon: replaced with hyphen when making resource identifier.")
+			LogWarning("Warning: assessment identifier with colon: replaced with hyphen when making resource identifier.")
 			value='-'.join(value.split(':'))
 		value = self.resource.SetIdentifier(value)
 		self.assessment.SetIdentifier(value)
@@ -1407,14 +1504,15 @@ class QTIAssessment(InstructureHelperContainer):
 		return self.assessment.title
 
 	def DeclareOutcome (self,decvar):
-		self.PrintWarning("Outcomes not supported on assessments: identifier: %s, type: %s, min: %s, max: %s" % (decvar.identifier,decvar.baseType, decvar.min, decvar.max))
+		self.PrintWarning("Outcomes not supported on assessments: identifier: %s, type: %s, min: %s, max: %s",args=(decvar.identifier,decvar.baseType, decvar.min, decvar.max))
 
-	def PrintWarning (self,warning,force=0):
-		if warning not in self.warnings:
-			self.msg=self.msg+warning+'\n'
-			self.warnings[warning]=1
+	def PrintWarning (self,warning,force=0,args=()):
+		key=(GetWarningCode(warning),args)
+		if key not in self.warnings:
+			self.warnings[key]=1
+			self.parser.CountWarning(key[0])
 		if force:
-			self.parent.PrintWarning(warning,1)
+			self.parent.PrintWarning(warning,1,args)
 
 	def CloseObject (self):
 		if self.bb_assessment_type == 'Pool':
@@ -1433,16 +1531,23 @@ class QTIAssessment(InstructureHelperContainer):
 		f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
 		if not self.parser.options.noComment:
 			f.write('<!--\n')
-			f.write(EncodeComment(self.msg))
+			f.write(EncodeComment(FormatWarnings(self.warnings)))
 			f.write('\t-->\n\n')
 
 		self.assessment.SetItemSessionControl(self.sessionControl)
-		self.assessment.WriteXML(f)
+		if self.parser.stats:
+			self.parser.stats.EnterPhase('WriteXML')
+		try:
+			self.assessment.WriteXML(f)
+		finally:
+			if self.parser.stats:
+				self.parser.stats.ExitPhase()
 		cpf=CPFile()
 		cpf.SetHREF(self.fName)
 		cpf.SetData(f.getvalue())
 		f.close()
 		self.resource.AddFile(cpf,1)
+		self.GetRoot().FlushResource(self.resource)
 
 
 # QTISection
@@ -1520,7 +1625,7 @@ class QTISection(InstructureHelperContainer):
 		return self
 
 	def DeclareOutcome (self,decvar):
-		self.PrintWarning("Outcomes not supported on section: identifier: %s, type: %s, min: %s, max: %s" % (decvar.identifier,decvar.baseType, decvar.min, decvar.max))
+		self.PrintWarning("Outcomes not supported on section: identifier: %s, type: %s, min: %s, max: %s",args=(decvar.identifier,decvar.baseType, decvar.min, decvar.max))
 
 	def CloseObject (self):
 		self.section.ProcessReferences()
@@ -1869,7 +1974,7 @@ class ItemRef(QTIObjectV1):
 	def SetAttribute_linkrefid (self,value):
 		self.linkrefid = value
 		if ':' in value:
-			print("Warning: item identifier with colon: replaced with hyphen when making resource identifier.")
+			LogWarning("Warning: item identifier with colon: replaced with hyphen when making resource identifier.")
 			value='-'.join(value.split(':'))
 		self.clean_linkrefid = CPResource.FixIdentifier(value)
 
@@ -1937,7 +2042,7 @@ class QTIItem(InstructureHelperContainer):
 		self.item=AssessmentItem()
 		self.resource=CPResource()
 		self.resource.SetType("imsqti_item_xmlv2p0")
-		self.resource.SetIdentifier("%s" % randint(1,100000))
+		self.resource.SetIdentifier(self.parser.GenerateIdentifier())
 		self.educationalMetadata=None
 		self.variables={'FEEDBACK':None}
 		self.declareFeedback=0
@@ -1946,9 +2051,8 @@ class QTIItem(InstructureHelperContainer):
 		self.max=None
 		self.interactions={}
 		if 'ident' in attrs:
-			print('-- Converting item id="'+attrs['ident']+'" --')
+			LogInfo('-- Converting item id="'+attrs['ident']+'" --')
 		self.warnings={}
-		self.msg=""
 		self.ParseAttributes(attrs)
 		if not self.item.language and self.parser.options.lang:
 			self.item.SetLanguage(self.parser.options.lang)
@@ -1966,7 +2070,7 @@ class QTIItem(InstructureHelperContainer):
 			self.files={}
 
 	def SetAttribute_maxattempts (self,value):
-		self.PrintWarning("Warning: maxattempts can not be controlled at item level, ignored: maxattempts='"+value+"'")
+		self.PrintWarning("Warning: maxattempts can not be controlled at item level, ignored: maxattempts='%s'",args=(value,))
 		self.PrintWarning("Note: in future, maxattempts will probably be controllable at assessment or assessment section level")
 
 	def SetAttribute_label (self,value):
@@ -1976,7 +2080,7 @@ class QTIItem(InstructureHelperContainer):
 	def SetAttribute_ident (self,value):
 		if self.item.identifier: return
 		if ':' in value:
-			print("Warning: item identifier with colon: replaced with hyphen when making resource identifier.")
+			LogWarning("Warning: item identifier with colon: replaced with hyphen when making resource identifier.")
 			value='-'.join(value.split(':'))
 		value = self.resource.SetIdentifier(value);
 		self.item.SetIdentifier(value);
@@ -2007,9 +2111,9 @@ class QTIItem(InstructureHelperContainer):
 	def DeclareResponse (self,identifier,cardinality,baseType,default=None):
 		if not identifier: identifier = 'no_id'
 		if identifier in self.responses:
-			self.PrintWarning('Warning: duplicate response identifier: %s' % identifier)
+			self.PrintWarning('Warning: duplicate response identifier: %s',args=(identifier,))
 		if identifier in self.variables:
-			self.PrintWarning('Warning: duplicate variable name, renaming response "'+identifier+'"')
+			self.PrintWarning('Warning: duplicate variable name, renaming response "%s"',args=(identifier,))
 			self.responses[identifier]=self.UniqueVarName(identifier)
 		else:
 			self.responses[identifier]=identifier
@@ -2024,7 +2128,7 @@ class QTIItem(InstructureHelperContainer):
 		if identifier in self.responses:
 			raise QTIException(eDuplicateResponse,identifier)
 		if identifier in self.variables:
-			self.PrintWarning('Warning: duplicate variable name, renaming response "'+identifier+'"')
+			self.PrintWarning('Warning: duplicate variable name, renaming response "%s"',args=(identifier,))
 			self.responses[identifier]=self.UniqueVarName(identifier)
 		else:
 			self.responses[identifier]=identifier
@@ -2079,7 +2183,7 @@ class QTIItem(InstructureHelperContainer):
 			elif isinstance(interaction,SliderInteraction):
 				qtiMD.AddInteractionType("sliderInteraction")
 			else:
-				print('Warning: unexpected interaction type (whoops): %s!'%repr(interaction))
+				LogWarning('Warning: unexpected interaction type (whoops): %s!'%repr(interaction))
 		if self.item.HasModalFeedback():
 			qtiMD.SetFeedbackType('nonadaptive')
 		else:
@@ -2104,7 +2208,7 @@ class QTIItem(InstructureHelperContainer):
 		if decvar.identifier in self.outcomes:
 			self.PrintWarning("Warning: multiple <outcomes> with same identifier, using last one.")
 		if decvar.identifier in self.variables:
-			print('Warning: duplicate variable name, renaming outcome "'+decvar.identifier+'"')
+			LogWarning('Warning: duplicate variable name, renaming outcome "'+decvar.identifier+'"')
 			self.outcomes[decvar.identifier]=self.UniqueVarName(decvar.identifier)
 		else:
 			self.outcomes[decvar.identifier]=decvar.identifier
@@ -2123,9 +2227,9 @@ class QTIItem(InstructureHelperContainer):
 		if identifier in self.outcomes:
 			return self.variables[self.outcomes[identifier]][0]
 		else:
-			self.PrintWarning('Warning: reference to undeclared outcome, auto-declaring "%s" as type float'%identifier)
+			self.PrintWarning('Warning: reference to undeclared outcome, auto-declaring "%s" as type float',args=(identifier,))
 			if identifier in self.variables:
-				print('Warning: duplicate variable name, renaming outcome "'+identifier+'"')
+				LogWarning('Warning: duplicate variable name, renaming outcome "'+identifier+'"')
 				self.outcomes[identifier]=self.UniqueVarName(identifier)
 			else:
 				self.outcomes[identifier]=identifier
@@ -2199,12 +2303,32 @@ class QTIItem(InstructureHelperContainer):
 		if RelativeURL(uri):
 			root=self.GetRoot()
 			path=root.ResolveURI(uri)
+			if self.parser.options.fixCase and not PathExists(path):
+				fixedPath=FindPathIgnoreCase(path)
+				if fixedPath:
+					LogWarning('Warning: fixing case of file reference "%s" to match "%s"'%(uri,fixedPath))
+					path=fixedPath
 			cpf.SetDataPath(path)
-			if os.path.exists(cpf.dataPath):
+			if PathExists(cpf.dataPath):
 				# find the last path component
 				dName,fName=os.path.split(path)
-				# Use this file name in the content package
-				fName=root.cp.GetUniqueFileName(fName)
+				sharedName=None
+				dataHash=None
+				if self.parser.options.dedupMedia and not PathIsDir(path):
+					try:
+						dataHash=root.cp.GetFileHash(path)
+					except OSError:
+						# not readable, copying it will report the problem
+						pass
+					else:
+						sharedName=root.cp.GetHashFileName(dataHash)
+				if sharedName:
+					# the same data is already in the package
+					fName=sharedName
+					cpf.SetShared(1)
+				else:
+					# Use this file name in the content package
+					fName=root.cp.GetUniqueFileName(fName,dataHash)
 				cpLocation=EncodePathSegment(fName)
 			else:
 				# if the file doesn't exist in this package just leave the path alone
@@ -2257,7 +2381,7 @@ class QTIItem(InstructureHelperContainer):
 		# Check maximum score
 		if self.max:
 			if len(self.outcomes)!=1:
-				self.PrintWarning("Warning: qmd_maximumscore ignored for %s, multiple (or zero) outcomes declared"%self.item.identifier)
+				self.PrintWarning("Warning: qmd_maximumscore ignored for %s, multiple (or zero) outcomes declared",args=(self.item.identifier,))
 			else:
 				declaration,decvar=self.variables[list(self.outcomes.values())[0]]
 				declaration.SetNormalMaximum(self.max)
@@ -2279,21 +2403,29 @@ class QTIItem(InstructureHelperContainer):
 		f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
 		if not self.parser.options.noComment:
 			f.write('<!--\n')
-			f.write(EncodeComment(self.msg))
+			f.write(EncodeComment(FormatWarnings(self.warnings)))
 			f.write('\t-->\n\n')
-		self.item.WriteXML(f)
+		if self.parser.stats:
+			self.parser.stats.EnterPhase('WriteXML')
+		try:
+			self.item.WriteXML(f)
+		finally:
+			if self.parser.stats:
+				self.parser.stats.ExitPhase()
 		cpf=CPFile()
 		cpf.SetHREF(self.fName)
 		cpf.SetData(f.getvalue())
 		f.close()
 		self.resource.AddFile(cpf,1)
+		self.GetRoot().FlushResource(self.resource)
 
-	def PrintWarning (self,warning,force=0):
-		if warning not in self.warnings:
-			self.msg=self.msg+warning+'\n'
-			self.warnings[warning]=1
+	def PrintWarning (self,warning,force=0,args=()):
+		key=(GetWarningCode(warning),args)
+		if key not in self.warnings:
+			self.warnings[key]=1
+			self.parser.CountWarning(key[0])
 		if force:
-			self.parent.PrintWarning(warning,1)
+			self.parent.PrintWarning(warning,1,args)
 
 
 # ItemMetadata
@@ -2371,7 +2503,7 @@ class BBBase(QTIObjectV1):
 	def CloseObject (self):
 		self.data=self.data.strip()
 		if self.data:
-			self.PrintWarning("Converting proprietary Blackboard metadata field %s = %s" % (self.label, self.data))
+			self.PrintWarning("Converting proprietary Blackboard metadata field %s = %s",args=(self.label, self.data))
 
 # bbmd_asi_object_id
 class BBObjectID(BBBase):
@@ -2429,7 +2561,7 @@ class D2LBase(QTIObjectV1):
 	def CloseObject (self):
 		self.data=self.data.strip()
 		if self.data:
-			self.PrintWarning("Converting proprietary D2LD2LPoints metadata field %s = %s" % (self.label, self.data))
+			self.PrintWarning("Converting proprietary D2LD2LPoints metadata field %s = %s",args=(self.label, self.data))
 
 
 class D2LPoints(D2LBase):
@@ -2466,7 +2598,7 @@ class D2LTimeLimit(D2LBase):
 				# d2l time is in minutes, qti does time in seconds
 				self.container.SetDuration("%s" % (float(self.data) * 60))
 			except ValueError:
-				self.PrintWarning("Warning: invalid time limit value: %s" % self.data)
+				self.PrintWarning("Warning: invalid time limit value: %s",args=(self.data,))
 
 class D2LPassword(D2LBase):
 	def __init__(self,name,attrs,parent):
@@ -2776,8 +2908,8 @@ class QMDContributor(QTIObjectV1):
 					contributor.AddEntity(vcard)
 				self.GetMDContainer().AddContributor(contributor)
 		else:
-			self.PrintWarning('Warning: qmd_%s support disabled'%self.role,1)
-			self.PrintWarning('Warning: ignored qmd_%s value: %s'%(self.role,self.data))
+			self.PrintWarning('Warning: qmd_%s support disabled',1,args=(self.role,))
+			self.PrintWarning('Warning: ignored qmd_%s value: %s',args=(self.role,self.data))
 
 
 # QMDOrganisation
@@ -2812,7 +2944,7 @@ class QMDOrganisation(QTIObjectV1):
 			self.GetMDContainer().AddContributor(contributor)
 		else:
 			self.PrintWarning('Warning: qmd_organisation support disabled',1)
-			self.PrintWarning('Warning: ignored qmd_organisation value: %s'%self.data)
+			self.PrintWarning('Warning: ignored qmd_organisation value: %s',args=(self.data,))
 
 
 
@@ -2913,7 +3045,7 @@ class CanvasBase(QTIObjectV1):
 	def CloseObject (self):
 		self.data=self.data.strip()
 		if self.data:
-			self.PrintWarning("Converting proprietary canvas metadata field %s = %s" % (self.label, self.data))
+			self.PrintWarning("Converting proprietary canvas metadata field %s = %s",args=(self.label, self.data))
 
 # points_possible
 # -----------
@@ -2992,7 +3124,7 @@ class WCTBase(QTIObjectV1):
 	def CloseObject (self):
 		self.data=self.data.strip()
 		if self.data:
-			self.PrintWarning("Converting proprietary WebCT metadata field %s = %s" % (self.label, self.data))
+			self.PrintWarning("Converting proprietary WebCT metadata field %s = %s",args=(self.label, self.data))
 
 # WCTShowFeedback
 # -----------
@@ -3168,7 +3300,7 @@ class QMDTimeLimit(QMDItemType):
 				if not isinstance(self.container, QTIObjectBank):
 					self.container.SetDuration("%s" % (float(self.data) * 60))
 			except ValueError:
-				self.PrintWarning("Warning: invalid time limit value: %s" % self.data)
+				self.PrintWarning("Warning: invalid time limit value: %s",args=(self.data,))
 
 class CCBase(QTIObjectV1):
 	def __init__(self,name,attrs,parent):
@@ -3183,7 +3315,7 @@ class CCBase(QTIObjectV1):
 	def CloseObject (self):
 		self.data=self.data.strip()
 		if self.data:
-			self.PrintWarning("Converting common cartridge metadata field %s = %s" % (self.label, self.data))
+			self.PrintWarning("Converting common cartridge metadata field %s = %s",args=(self.label, self.data))
 
 class CCMaxAttempts(CCBase):
 	def __init__(self,name,attrs,parent):
@@ -3314,7 +3446,7 @@ class QTIMetadataField(QTIObjectV1):
 			mdf.AddData(self.entry)
 			mdf.CloseObject()
 		else:
-			self.PrintWarning("Unmapped metadata field: %s=%s"%(self.label,self.entry),1)
+			self.PrintWarning("Unmapped metadata field: %s=%s",1,args=(self.label,self.entry))
 
 
 # FieldLabel
@@ -3505,7 +3637,7 @@ class Objectives(QTIObjectV1):
 		self.view='all'
 		self.ParseAttributes(attrs)
 		if self.view!='all':
-			self.PrintWarning('Warning: objectives are now metadata, converting to rubric for view="'+self.view+'"')
+			self.PrintWarning('Warning: objectives are now metadata, converting to rubric for view="%s"',args=(self.view,))
 			self.rubric=RubricBlock()
 			self.rubric.AppendView(self.view)
 
@@ -3769,7 +3901,7 @@ class MatThing(QTIObjectV1):
 		#print tokens
 		stack=[]
 		for t in tokens:
-			if isinstance(t, DictType):
+			if isinstance(t, dict):
 				# a tag
 				if t['.type']=='EmptyElemTag' or (t['.name'].lower() in ['hr','br','img'] and t['.type']=='STag'):
 					# an empty tag
@@ -3787,13 +3919,13 @@ class MatThing(QTIObjectV1):
 							break
 						else:
 							# ommitted closing tag
-							self.PrintWarning("Warning: dangling embedding formatting tags are not allowed, closing <%s>"%tEnd['.name'])
+							self.PrintWarning("Warning: dangling embedding formatting tags are not allowed, closing <%s>",args=(tEnd['.name'],))
 							self.endElement(tEnd['.name'])
 			else:
 				self.characters(t)
 		while stack:
 			tEnd=stack.pop()
-			self.PrintWarning("Warning: dangling embedding formatting tags are not allowed, closing <%s>"%tEnd['.name'])
+			self.PrintWarning("Warning: dangling embedding formatting tags are not allowed, closing <%s>",args=(tEnd['.name'],))
 			self.endElement(tEnd['.name'])
 
 	def startElement(self,name,attrs):
@@ -3843,7 +3975,7 @@ class MatThing(QTIObjectV1):
 		else:
 			newElement=SimpleInline("span")
 			newElement.SetClass(name)
-			self.PrintWarning('Warning: unsupported embedded formatting instruction replaced by <span class="%s">'%name,1)
+			self.PrintWarning('Warning: unsupported embedded formatting instruction replaced by <span class="%s">',1,args=(name,))
 		if newElement:
 			if isinstance(newElement,BodyElement):
 				newElement.SetID(attrs.get('id',None))
@@ -3914,7 +4046,7 @@ class MatEmText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 
 	def SetAttribute_charset (self,value):
 		if value.lower()!='ascii-us':
-			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="'+value+'"')
+			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="%s"',args=(value,))
 
 	def SetAttribute_xml_space (self,value):
 		self.space=value
@@ -3936,7 +4068,7 @@ class MatEmText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 
 	def CloseObject (self):
 		if self.entityRef:
-			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored "+self.entityRef)
+			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored %s",args=(self.entityRef,))
 			element=None
 		elif self.uri:
 			self.PrintWarning("Warning: material included from external object referenced by matemtext will not be emphasized")
@@ -3966,7 +4098,7 @@ class MatEmText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 				tokens=p.TokenizeString(self.data)
 				self.ParseTextTokens(tokens)
 			except XMLException:
-				self.PrintWarning("Warning: failed to make well-formed XML out of embedded text/html (%s: %s)"%(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
+				self.PrintWarning("Warning: failed to make well-formed XML out of embedded text/html (%s: %s)",args=(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
 				self.PrintWarning("Warning: offending text/html will be left undecoded")
 				self.characters(self.data)
 			element=SimpleInline('em')
@@ -3978,13 +4110,13 @@ class MatEmText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 				tokens=p.TokenizeString(self.data)
 				self.ParseTextTokens(tokens)
 			except RTFException:
-				self.PrintWarning("Warning: failed to make well-formed RTF out of embedded text/rtf (%s: %s)"%(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
+				self.PrintWarning("Warning: failed to make well-formed RTF out of embedded text/rtf (%s: %s)",args=(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
 				self.PrintWarning("Warning: offending text/rtf will be left undecoded")
 				self.characters(self.data)
 			element=SimpleInline('em')
 			element.AppendElement(xhtml_text(self.htmlData))
 		else:
-			self.PrintWarning('Unknown text type: ignored matemtext with texttype="%s" treated as text/plain'%self.type)
+			self.PrintWarning('Unknown text type: ignored matemtext with texttype="%s" treated as text/plain',args=(self.type,))
 			self.characters(self.data)
 			self.endElement('qtihtml')
 			element=None
@@ -4039,7 +4171,7 @@ class MatText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 
 	def SetAttribute_charset (self,value):
 		if value.lower()!='ascii-us':
-			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="'+value+'"')
+			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="%s"',args=(value,))
 
 	def SetAttribute_xml_space (self,value):
 		self.space=value
@@ -4061,7 +4193,7 @@ class MatText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 
 	def CloseObject (self):
 		if self.entityRef:
-			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored "+self.entityRef)
+			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored %s",args=(self.entityRef,))
 			element=None
 		elif self.uri:
 			element=self.MakeObject()
@@ -4091,13 +4223,13 @@ class MatText(MatThing, handler.ContentHandler, handler.ErrorHandler):
 				tokens=p.TokenizeString(self.data)
 				self.ParseTextTokens(tokens)
 			except RTFException:
-				self.PrintWarning("Warning: failed to make well-formed RTF out of embedded text/rtf (%s: %s)"%(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
+				self.PrintWarning("Warning: failed to make well-formed RTF out of embedded text/rtf (%s: %s)",args=(str(sys.exc_info()[0]),str(sys.exc_info()[1])))
 				self.PrintWarning("Warning: offending text/rtf will be left undecoded")
 				self.characters(self.data)
 			element=None
 			self.endElement('qtihtml')
 		else:
-			self.PrintWarning('Unknown text type: ignored mattext with texttype="%s" treated as text/plain'%self.type)
+			self.PrintWarning('Unknown text type: ignored mattext with texttype="%s" treated as text/plain',args=(self.type,))
 			self.characters(self.data)
 			self.endElement('qtihtml')
 			element=None
@@ -4158,7 +4290,7 @@ class MatApplication(MatThing):
 	def CloseObject (self):
 		element=None
 		if self.entityRef:
-			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored "+self.entityRef)
+			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored %s",args=(self.entityRef,))
 		elif not self.uri:
 			self.PrintWarning("Unsupported: inclusion of inline images")
 		else:
@@ -4210,7 +4342,7 @@ class MatImage(MatThing):
 	def CloseObject (self):
 		element=None
 		if self.entityRef:
-			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored "+self.entityRef)
+			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored %s",args=(self.entityRef,))
 		elif not self.uri:
 			self.PrintWarning("Unsupported: inclusion of inline images")
 		else:
@@ -4250,7 +4382,7 @@ class MatAudio(MatThing):
 	def CloseObject (self):
 		element=None
 		if self.entityRef:
-			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored "+self.entityRef)
+			self.PrintWarning("Unsupported: inclusion of material through external entities: ignored %s",args=(self.entityRef,))
 		elif not self.uri:
 			self.PrintWarning("Unsupported: inclusion of inline audio data")
 		else:
@@ -4327,7 +4459,7 @@ class ResponseThing(QTIObjectV1):
 			self.preChildren.append(element)
 
 	def BadInteraction (self,renderName):
-		self.PrintWarning('Warning: ignoring <'+self.name+'> x <'+renderName+'>')
+		self.PrintWarning('Warning: ignoring <%s> x <%s>',args=(self.name,renderName))
 
 	def SetInteraction (self,interaction):
 		self.interaction=interaction
@@ -4453,7 +4585,7 @@ class ResponseNum(ResponseThing):
 		elif value.lower()=="decimal" or value.lower()=="scientific":
 			self.baseType="float"
 		else:
-			self.PrintWarning("Warning: unrecognized numtype treated as float ("+value+")")
+			self.PrintWarning("Warning: unrecognized numtype treated as float (%s)",args=(value,))
 			self.baseType="float"
 
 	def SetBaseType (self,value):
@@ -4690,7 +4822,7 @@ class RenderSlider(RenderThing):
 						self.step=int(self.step)
 					self.default=int(self.default)
 			else:
-				self.PrintWarning('Warning: ignoring '+self.parent.cardinality+' response <render_slider>')
+				self.PrintWarning('Warning: ignoring %s response <render_slider>',args=(self.parent.cardinality,))
 		elif (isinstance(self.parent,ResponseLID)):
 			if self.parent.cardinality=='single':
 				self.interactionThing=ChoiceInteraction
@@ -4704,7 +4836,7 @@ class RenderSlider(RenderThing):
 		elif value.strip().lower()=='vertical':
 			self.orientation='vertical'
 		else:
-			self.PrintWarning('Warning: ignoring unrecognized orientation ('+value+')')
+			self.PrintWarning('Warning: ignoring unrecognized orientation (%s)',args=(value,))
 
 	def SetAttribute_lowerbound (self,value):
 		self.lowerbound=self.ReadFloat(value,0)
@@ -4803,7 +4935,7 @@ class RenderFib(RenderThing):
 
 	def SetAttribute_encoding (self,value):
 		if value.upper()!='UTF_8':
-			self.PrintWarning('Warning: encoding attribute of render_fib not supported, ignored "'+value+'"')
+			self.PrintWarning('Warning: encoding attribute of render_fib not supported, ignored "%s"',args=(value,))
 
 	def SetAttribute_fibtype (self,value):
 		v=value.strip().lower()
@@ -4814,7 +4946,7 @@ class RenderFib(RenderThing):
 		elif v in ['decimal','scientific']:
 			self.fibtype='float'
 		else:
-			self.PrintWarning('Warning: unknown fibtype treated as string ('+value+')')
+			self.PrintWarning('Warning: unknown fibtype treated as string (%s)',args=(value,))
 
 	def SetAttribute_rows (self,value):
 		self.rows=self.ReadInteger(value,0)
@@ -4831,14 +4963,14 @@ class RenderFib(RenderThing):
 		self.classid=value.strip()
 
 	def SetAttribute_minnumber (self,value):
-		self.PrintWarning('Warning: minimum response no longer supported, ignoring minnumber="'+value+'"')
+		self.PrintWarning('Warning: minimum response no longer supported, ignoring minnumber="%s"',args=(value,))
 
 	def SetAttribute_maxnumber (self,value):
 		self.max=self.ReadInteger(value,None)
 
 	def SetAttribute_charset (self,value):
 		if value.lower()!='ascii-us':
-			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="'+value+'"')
+			self.PrintWarning('Warning: charset attribute no longer supported: ignored charset="%s"',args=(value,))
 
 	def AppendElement (self,element):
 		self.children.append(element)
@@ -4950,10 +5082,10 @@ class ResponseLabel(QTIObjectV1):
 
 	def SetAttribute_rrange (self,value):
 		if value.lower()!='exact':
-			self.PrintWarning('Warning: rrange is no longer supported, ignored "'+value+'"')
+			self.PrintWarning('Warning: rrange is no longer supported, ignored "%s"',args=(value,))
 
 	def SetAttribute_labelrefid (self,value):
-		self.PrintWarning("Warning: labelrefid is no longer supported in version 2, ignored "+value)
+		self.PrintWarning("Warning: labelrefid is no longer supported in version 2, ignored %s",args=(value,))
 
 	def SetAttribute_ident (self,value):
 		value = D2L_IDENTIFIER_REPLACER.sub('', value)
@@ -4984,7 +5116,7 @@ class ResponseLabel(QTIObjectV1):
 			choice.SetFixed(not self.rshuffle)
 			self.data=self.data.strip()
 			if self.data and self.children:
-				self.PrintWarning('Warning: ignoring PCDATA in <response_label>, "'+self.data+'"')
+				self.PrintWarning('Warning: ignoring PCDATA in <response_label>, "%s"',args=(self.data,))
 			elif self.data:
 				element=xhtml_text()
 				element.SetText(self.data)
@@ -5003,7 +5135,7 @@ class ResponseLabel(QTIObjectV1):
 				choice.SetMatchGroup(self.matchGroup)
 			self.data=self.data.strip()
 			if self.data and self.children:
-				self.PrintWarning('Warning: ignoring PCDATA in <response_label>, "'+self.data+'"')
+				self.PrintWarning('Warning: ignoring PCDATA in <response_label>, "%s"',args=(self.data,))
 			elif self.data:
 				element=xhtml_text()
 				element.SetText(self.data)
@@ -5026,7 +5158,7 @@ class ResponseLabel(QTIObjectV1):
 		elif self.labelThing==str:
 			self.parent.AppendLabel(self.identifier)
 		else:
-			self.PrintWarning('Warning: ignoring <response_label iden="'+self.identifier+'">')
+			self.PrintWarning('Warning: ignoring <response_label iden="%s">',args=(self.identifier,))
 
 
 # FlowLabel
@@ -5081,7 +5213,7 @@ class ItemFeedback(QTIObjectV1):
 
 	def SetAttribute_view (self,value):
 		if not (value.lower() in ['all','candidate']):
-			self.PrintWarning("Warning: discarding view on feedback ("+value+")")
+			self.PrintWarning("Warning: discarding view on feedback (%s)",args=(value,))
 
 	def SetAttribute_ident (self,value):
 		self.identifier = value
@@ -5120,7 +5252,7 @@ class Solution(QTIObjectV1):
 			solclass='solution.'+self.feedbackstyle
 		else:
 			solclass='solution'
-		self.PrintWarning('Warning: solution material is being replaced by div with class="'+solclass+'"')
+		self.PrintWarning('Warning: solution material is being replaced by div with class="%s"',args=(solclass,))
 		self.div.SetClass(solclass)
 
 	def SetAttribute_feedbackstyle (self,value):
@@ -5176,7 +5308,7 @@ class Hint(QTIObjectV1):
 			hintclass='hint.'+self.feedbackstyle
 		else:
 			hintclass='hint'
-		self.PrintWarning('Warning: hint material is being replaced by div with class="'+hintclass+'"')
+		self.PrintWarning('Warning: hint material is being replaced by div with class="%s"',args=(hintclass,))
 		self.div.SetClass(hintclass)
 
 	def SetAttribute_feedbackstyle (self,value):
@@ -5233,7 +5365,7 @@ class ResProcessing(QTIObjectV1):
 		self.rpAddPoint=self.rp
 
 	def SetAttribute_scoremodel (self,value):
-		self.PrintWarning('Warning: scoremodel not supported, ignoring "'+value+'"')
+		self.PrintWarning('Warning: scoremodel not supported, ignoring "%s"',args=(value,))
 
 	def AddRespCondition (self,expression,rules,continueFlag):
 		if continueFlag:
@@ -5330,7 +5462,7 @@ class DecVar(QTIObjectV1):
 			self.PrintWarning('Warning: treating vartype="Set" as equivalent to "Enumerated"')
 			self.baseType='identifier'
 		else:
-			self.PrintWarning('Error: bad value for decvar, ignored decvar="'+value+'"')
+			self.PrintWarning('Error: bad value for decvar, ignored decvar="%s"',args=(value,))
 
 	def SetAttribute_defaultval (self,value):
 		self.default=value
@@ -5342,7 +5474,7 @@ class DecVar(QTIObjectV1):
 		self.max=self.ReadFloat(value,1)
 
 	def SetAttribute_members (self,value):
-		self.PrintWarning('Warning: enumerated members no longer supported, ignoring "'+value+'"')
+		self.PrintWarning('Warning: enumerated members no longer supported, ignoring "%s"',args=(value,))
 
 	def SetAttribute_cutvalue (self,value):
 		self.PrintWarning('Warning: cutvalue on outcome will be ignored.')
@@ -5386,7 +5518,7 @@ class InterpretVar(QTIObjectV1):
 
 	def SetAttribute_view (self,view):
 		if view.strip().lower()!='all':
-			self.PrintWarning('Warning: view restriction on outcome interpretation no longer supported ('+view+')')
+			self.PrintWarning('Warning: view restriction on outcome interpretation no longer supported (%s)',args=(view,))
 
 	def AppendElement (self,element):
 		self.interpretation=self.interpretation+element.ExtractText()
@@ -5419,7 +5551,7 @@ class RespCondition(QTIObjectV1):
 		self.continueFlag=self.ReadYesNo(value,0)
 
 	def SetAttribute_title (self,value):
-		self.PrintWarning('Warning: titles on respconditions no longer supported, ignored "'+value+'"')
+		self.PrintWarning('Warning: titles on respconditions no longer supported, ignored "%s"',args=(value,))
 
 	def AddExpression (self,expression):
 		self.expression=expression
@@ -5549,7 +5681,7 @@ class DisplayFeedback(QTIObjectV1):
 
 	def SetAttribute_feedbacktype (self,value):
 		if value.lower()!='response':
-			self.PrintWarning("Warning: feedbacktype is unused and is being discarded ("+value+")")
+			self.PrintWarning("Warning: feedbacktype is unused and is being discarded (%s)",args=(value,))
 
 	def SetAttribute_linkrefid (self,value):
 		self.identifier=self.ReadIdentifier(value,FEEDBACK_PREFIX)
@@ -5860,10 +5992,10 @@ class VarLT(VarThing):
 				expression.AddExpression(self.varExpression)
 				expression.AddExpression(self.valExpression)
 			else:
-				self.PrintWarning('Warning: varlt not support for type "%s", replacing with NULL'%self.varBaseType)
+				self.PrintWarning('Warning: varlt not support for type "%s", replacing with NULL',args=(self.varBaseType,))
 				expression=NullOperator()
 		else:
-			self.PrintWarning('Warning: varlt not support for cardinality "%s", replacing with NULL'%self.varCardinality)
+			self.PrintWarning('Warning: varlt not support for cardinality "%s", replacing with NULL',args=(self.varCardinality,))
 			expression=NullOperator()
 		self.parent.AddExpression(expression)
 
@@ -5893,10 +6025,10 @@ class VarLTE(VarThing):
 				expression.AddExpression(self.varExpression)
 				expression.AddExpression(self.valExpression)
 			else:
-				self.PrintWarning('Warning: varlte not support for type "%s", replacing with NULL'%self.varBaseType)
+				self.PrintWarning('Warning: varlte not support for type "%s", replacing with NULL',args=(self.varBaseType,))
 				expression=NullOperator()
 		else:
-			self.PrintWarning('Warning: varlte not support for cardinality "%s", replacing with NULL'%self.varCardinality)
+			self.PrintWarning('Warning: varlte not support for cardinality "%s", replacing with NULL',args=(self.varCardinality,))
 			expression=NullOperator()
 		self.parent.AddExpression(expression)
 
@@ -5927,10 +6059,10 @@ class VarGT(VarThing):
 				expression.AddExpression(self.varExpression)
 				expression.AddExpression(self.valExpression)
 			else:
-				self.PrintWarning('Warning: vargt not support for type "%s", replacing with NULL'%self.varBaseType)
+				self.PrintWarning('Warning: vargt not support for type "%s", replacing with NULL',args=(self.varBaseType,))
 				expression=NullOperator()
 		else:
-			self.PrintWarning('Warning: vargt not support for cardinality "%s", replacing with NULL'%self.varCardinality)
+			self.PrintWarning('Warning: vargt not support for cardinality "%s", replacing with NULL',args=(self.varCardinality,))
 			expression=NullOperator()
 		self.parent.AddExpression(expression)
 
@@ -5960,10 +6092,10 @@ class VarGTE(VarThing):
 				expression.AddExpression(self.varExpression)
 				expression.AddExpression(self.valExpression)
 			else:
-				self.PrintWarning('Warning: vargte not support for type "%s", replacing with NULL'%self.varBaseType)
+				self.PrintWarning('Warning: vargte not support for type "%s", replacing with NULL',args=(self.varBaseType,))
 				expression=NullOperator()
 		else:
-			self.PrintWarning('Warning: vargte not support for cardinality "%s", replacing with NULL'%self.varCardinality)
+			self.PrintWarning('Warning: vargte not support for cardinality "%s", replacing with NULL',args=(self.varCardinality,))
 			expression=NullOperator()
 		self.parent.AddExpression(expression)
 
@@ -5987,7 +6119,7 @@ class VarSubset(VarThing):
 		if value.lower()=='partial':
 			self.exactmatch=0
 		elif value.lower()!='exact':
-			self.PrintWarning('Warning: unrecognized setmatch value "'+value+'"')
+			self.PrintWarning('Warning: unrecognized setmatch value "%s"',args=(value,))
 
 	def CloseObject (self):
 		if self.index:
@@ -6001,10 +6133,10 @@ class VarSubset(VarThing):
 		if self.varCardinality=='single':
 			if self.valCardinality=='single':
 				# err, this looks like a simple test of equality...
-				self.PrintWarning("Warning: varsubset is being substituted with single match ("+self.identifier+")")
+				self.PrintWarning("Warning: varsubset is being substituted with single match (%s)",args=(self.identifier,))
 				expression=MatchOperator(self.varExpression,self.valExpression)
 			else:
-				self.PrintWarning("Error: can't match a subset against a response with single cardinality ("+self.identifier+")")
+				self.PrintWarning("Error: can't match a subset against a response with single cardinality (%s)",args=(self.identifier,))
 				expression=None
 		else:
 			# cardinality=='multiple' or cardinality=='ordered'
@@ -6292,10 +6424,14 @@ QTIASI_ELEMENTS={
 		'webct:var':WCTVar,
 	}
 
+# Number of hex digits of digest used in generated identifiers (60 bits)
+IDENTIFIER_DIGEST_LENGTH=15
+
 class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 	"""QTI Parser"""
 	def __init__(self,options):
 		self.options=options
+		LOG.Configure(options.logLevel,options.logJSON,options.logRepeat)
 		self.parser=etree.XMLParser(recover=True,resolve_entities=False)
 		self.elements=QTIASI_ELEMENTS
 		self.manifest=None
@@ -6308,7 +6444,24 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 			self.elements['qmd_author']=QMDContributor
 			self.elements['qmd_organisation']=QMDOrganisation
 		self.cp=ContentPackage()
+		self.cp.SetIncremental(self.options.incremental)
+		self.cp.SetMediaMethod(self.options.mediaMethod)
+		self.cp.SetCopyJobs(self.options.copyJobs)
+		if self.options.statsPath:
+			self.stats=QTIConversionStats()
+		else:
+			self.stats=None
+		self.cp.SetStats(self.stats)
+		# number of items (and assessments) with each warning code
+		self.warningCounts={}
+		if self.options.stream and self.options.cpZip:
+			self.cp.SetStreamZip(self.options.cpZip,self.options.create_error_files)
+		elif self.options.stream and self.options.cpPath:
+			self.cp.SetStreamPath(self.options.cpPath,self.options.create_error_files)
 		self.currPath=None
+		self.currName=None
+		# cleared if the files we parse depend on each other
+		self.isolated=1
 
 	def startElementNS (self, name, qname, attrs):
 		if attrs:
@@ -6327,12 +6480,36 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 			return name[1]
 
 	def ProcessFiles (self,basepath,files):
-		f=None
+		# the files may have changed since a previous run listed them
+		ResetDirectoryIndex()
+		if self.options.jobs>1:
+			self.ProcessFilesParallel(basepath,files)
+		elif self.options.cacheDir:
+			for path,name in self.ListFiles(basepath,files):
+				self.MergeFileResult(ConvertFileV1((self.options,path,name)))
+		else:
+			for path,name in self.ListFiles(basepath,files):
+				self.ProcessFile(path,name)
+
+	def ListFiles (self,basepath,files,root=None,messages=None):
+		"""Generates the (path,name) of the QTI files to process in order"""
+		# name is the path relative to the directory given (identifiers are
+		# made from it) and only archives given directly are scanned.  If
+		# messages is a list directories are reported by appending to it.
 		for fileName in files:
 			path=os.path.join(basepath,fileName)
-			if os.path.isdir(path):
-				print("Processing directory: : "+path)
-				children=os.listdir(path)
+			if root is None:
+				isDir=PathIsDir(path)
+				fileRoot=path if isDir else os.path.dirname(path)
+			else:
+				isDir=PathIsDir(path) and not IsArchive(path)
+				fileRoot=root
+			if isDir:
+				if messages is None:
+					LogInfo("Processing directory: : "+path)
+				else:
+					messages.append("Processing directory: : "+path)
+				children=ListDir(path)
 				# see if there is an imsmanifest and process it first
 				# The order of the rest doesn't mater
 				for i, v in enumerate(children):
@@ -6340,53 +6517,164 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 						if i:
 							children[0], children[i] = children[i], children[0]
 						break
-				self.ProcessFiles(path,children)
+				for child in self.ListFiles(path,children,fileRoot,messages):
+					yield child
 			elif fileName[-4:].lower() in ['.xml', '.dat', '.qti']:
-				print("Processing file: "+path)
-				f=open(path,'rb')
-				try:
-					self.Parse(f,path)
-				except QTIException:
-					print(sys.exc_info()[0])
-				finally:
-					f.close()
+				yield path,os.path.relpath(path,fileRoot).replace(os.sep,'/')
+
+	def ProcessFile (self,path,name=None):
+		LogInfo("Processing file: "+path)
+		f=OpenFile(path)
+		try:
+			self.Parse(f,path,name)
+		except QTIException:
+			LogError(sys.exc_info()[0])
+		finally:
+			f.close()
+
+	def ProcessFilesParallel (self,basepath,files):
+		# results are merged in serial order, files that can't be merged are
+		# converted again here so the output is the same as a serial run
+		# each file is listed with the directory messages that come before
+		# it so they can be logged in the same order as a serial run
+		paths=[]
+		messages=[]
+		for path,name in self.ListFiles(basepath,files,messages=messages):
+			paths.append((path,name,messages[:]))
+			del messages[:]
+		# the workers must not inherit buffered output
+		FlushLog()
+		pool=multiprocessing.Pool(self.options.jobs)
+		try:
+			results=pool.imap(ConvertFileV1,[(self.options,path,name) for path,name,discard in paths],PARALLEL_CHUNKSIZE)
+			for (path,name,dirMessages),result in zip(paths,results):
+				for message in dirMessages:
+					LogInfo(message)
+				self.MergeFileResult(result)
+		finally:
+			pool.terminate()
+		for message in messages:
+			LogInfo(message)
+
+	def MergeFileResult (self,result):
+		if result.isolated and self.cp.MergePackage(result.cp):
+			LOG.Replay(result.log)
+			self.MergeWarningCounts(result.warnings)
+			if self.stats:
+				if result.stats:
+					self.stats.Merge(result.stats)
+				else:
+					self.stats.AddCachedFile(result.path)
+		else:
+			self.ProcessFile(result.path,result.name)
 
 	def DumpCP (self):
-		if self.options.cpPath:
-			self.cp.DumpToDirectory(self.options.cpPath, self.options.create_error_files)
+		if self.stats:
+			self.stats.EnterPhase('dump')
+		try:
+			if self.options.cpZip:
+				self.cp.DumpToZip(self.options.cpZip, self.options.create_error_files)
+			elif self.options.cpPath:
+				self.cp.DumpToDirectory(self.options.cpPath, self.options.create_error_files)
+		finally:
+			if self.stats:
+				self.stats.ExitPhase()
+
+	def GenerateIdentifier (self):
+		# a digest of --idseed, the file's relative path and the element's
+		# position so the same input always gets the same identifiers
+		h=hashlib.sha256(("%s\n%s\n%i"%(self.options.idSeed,self.currName,
+			self.elementCount)).encode('utf-8'))
+		return str(int(h.hexdigest()[:IDENTIFIER_DIGEST_LENGTH],16))
+
+	def CountWarning (self,code):
+		self.warningCounts[code]=self.warningCounts.get(code,0)+1
+
+	def GetWarningCounts (self):
+		# keyed on template, codes are only meaningful in this process
+		return {WARNING_TEMPLATES[code]:count for code,count in self.warningCounts.items()}
+
+	def MergeWarningCounts (self,counts):
+		for template,count in counts.items():
+			code=GetWarningCode(template)
+			self.warningCounts[code]=self.warningCounts.get(code,0)+count
+
+	def SummarizeWarnings (self):
+		if not self.warningCounts:
+			return
+		LogWarning("Warning summary:")
+		counts=self.GetWarningCounts()
+		for template in sorted(counts,key=lambda x:(-counts[x],x)):
+			LogWarning("  %s \u00d7%s"%(WARNING_PARAMETER.sub('...',template),format(counts[template],',')))
+
+	def DumpStats (self):
+		if self.stats:
+			LogInfo("Writing statistics: "+self.options.statsPath)
+			self.stats.Write(self.options.statsPath)
 
-	def Parse (self,f,path):
+	def Parse (self,f,path,name=None):
 		global CURRENT_FILE_NAME
 		CURRENT_FILE_NAME = path.split('/')[-1][:-4]
+		LOG.SetFile(path)
 		self.currPath=path
+		if name is None:
+			name=os.path.basename(path)
+		self.currName=name
+		self.elementCount=0
 		self.gotRoot=0
 		self.cObject=None
 		self.objStack=[]
 		self.skipMode=0
+		if self.stats:
+			self.stats.StartFile(path)
 		try:
-			tree = etree.parse(f,self.parser)
-			if tree.getroot():
-				sax.saxify(tree, self)
+			if self.options.lowmem:
+				parsed=self.ParseEvents(f)
 			else:
-				print("ERROR: parsing %s"%path)
+				parsed=0
+			if not parsed:
+				tree = etree.parse(f,self.parser)
+				if tree.getroot():
+					sax.saxify(tree, self)
+				else:
+					LogError("ERROR: parsing %s"%path)
 		except (etree.XMLSyntaxError, SAXParseException):
 			if self.gotRoot:
-				print("WARNING: Error following final close tag ignored")
-				print(str(sys.exc_info()[0])+": "+str(sys.exc_info()[1]))
+				LogWarning("WARNING: Error following final close tag ignored")
+				LogWarning(str(sys.exc_info()[0])+": "+str(sys.exc_info()[1]))
 			else:
-				print("ERROR: parsing %s"%path)
-				print("       ("+str(sys.exc_info()[0])+": "+str(sys.exc_info()[1])+")")
-		self.currPath=None
-		CURRENT_FILE_NAME=None
+				LogError("ERROR: parsing %s"%path)
+				LogError("       ("+str(sys.exc_info()[0])+": "+str(sys.exc_info()[1])+")")
+		finally:
+			if self.stats:
+				self.stats.EndFile()
+			LOG.SetFile(None)
+			FlushLog()
+			self.currPath=None
+			CURRENT_FILE_NAME=None
+
+	def ParseEvents (self,f):
+		# returns 0, with f rewound, if there's no root element with content
+		target=QTIParserTarget(self)
+		try:
+			etree.parse(f,etree.XMLParser(recover=True,resolve_entities=False,target=target))
+		except etree.XMLSyntaxError:
+			if target.gotRoot:
+				raise
+		if target.gotRoot:
+			return 1
+		f.seek(0)
+		return 0
 
 	def resolveEntity(self,publicID,systemID):
-		print("Resolving: PUBLIC %s SYSTEM %s"%(publicID,systemID))
+		LogInfo("Resolving: PUBLIC %s SYSTEM %s"%(publicID,systemID))
 		if self.options.dtdDir:
 			systemID=os.path.join(self.options.dtdDir,'ims_qtiasiv1p2.dtd')
-		print("Returning: %s"%systemID)
+		LogInfo("Returning: %s"%systemID)
 		return systemID
 
 	def startElement(self, name, attrs):
+		self.elementCount+=1
 		parent=self.cObject
 		if parent is None:
 			assert not self.gotRoot, QTIException(assertElementOutsideRoot)
@@ -6404,6 +6692,8 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 					self.cObject.SetPath(self.currPath)
 					self.cObject.SetParser(self)
 				if isinstance(self.cObject,Manifest):
+					# manifests are shared between files
+					self.isolated=0
 					if self.currPath.endswith("imsmanifest.xml"):
 						self.cObject.SetCP(self.cp)
 						self.cObject.SetPath(self.currPath)
@@ -6421,13 +6711,26 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 				self.cObject=Unsupported(name,attrs,parent)
 			if isinstance(self.cObject,Unsupported):
 				self.skipMode=len(self.objStack)
+			if self.stats:
+				self.stats.CountElement(name)
+				if isinstance(self.cObject,QTIItem):
+					self.stats.StartItem()
 
 	def characters(self,ch):
 		self.cObject.AddData(ch)
 
 	def endElement(self,name):
 		parent=self.objStack.pop()
-		self.cObject.CloseObject()
+		if self.stats:
+			self.stats.EnterPhase('CloseObject')
+			try:
+				self.cObject.CloseObject()
+			finally:
+				self.stats.ExitPhase()
+			if isinstance(self.cObject,QTIItem):
+				self.stats.EndItem(self.cObject.resource.id,self.cObject.fName)
+		else:
+			self.cObject.CloseObject()
 		if self.skipMode>len(self.objStack):
 			self.skipMode=0
 		if parent is None:
@@ -6437,6 +6740,343 @@ class QTIParserV1(handler.ContentHandler, handler.ErrorHandler):
 			self.cObject=parent
 
 
+# Event parsing
+# -------------
+#
+class QTIParserTarget:
+	"""An lxml parser target that passes saxify's events to a QTIParserV1, for --lowmem"""
+	def __init__(self,parser):
+		self.parser=parser
+		self.tags=[]
+		self.chars=[]
+		self.root=None
+		self.gotRoot=0
+
+	def start(self,tag,attrib,nsmap=None):
+		self.tags.append(tag)
+		if len(self.tags)==1:
+			self.root=(tag,attrib)
+		else:
+			self.StartChild()
+			self.parser.startElementNS(SplitEventName(tag),None,self.GetAttributes(attrib))
+
+	def end(self,tag):
+		self.tags.pop()
+		if self.root:
+			# the root had no children
+			self.root=None
+			self.chars=[]
+		else:
+			self.EndData()
+			self.parser.endElementNS(SplitEventName(tag),None)
+
+	def data(self,data):
+		if self.tags:
+			self.chars.append(data)
+
+	def comment(self,text):
+		if self.tags:
+			self.StartChild()
+
+	def pi(self,target,data=None):
+		if self.tags:
+			self.StartChild()
+
+	def close(self):
+		# when recovering from errors the parser may not end every element
+		while self.tags:
+			self.end(self.tags[-1])
+		return None
+
+	def StartChild(self):
+		if self.root:
+			tag,attrib=self.root
+			self.root=None
+			self.gotRoot=1
+			self.parser.startElementNS(SplitEventName(tag),None,self.GetAttributes(attrib))
+		self.EndData()
+
+	def EndData(self):
+		if self.chars:
+			self.parser.characters(''.join(self.chars))
+			self.chars=[]
+
+	def GetAttributes(self,attrib):
+		return {SplitEventName(aName):value for aName,value in attrib.items()}
+
+def SplitEventName (name):
+	"""Splits an lxml '{namespace}name' into a SAX (namespace,name) tuple"""
+	if name[:1]=='{':
+		return tuple(name[1:].split('}',1))
+	else:
+		return (None,name)
+
+
+# Parallel conversion
+# -------------------
+#
+PARALLEL_CHUNKSIZE=4
+
+class QTIFileResult:
+	"""The result of converting a single file in isolation"""
+	def __init__(self,path,name):
+		self.path=path
+		self.name=name
+		# the messages logged while converting, see MessageLog.Replay
+		self.log=[]
+		self.cp=None
+		self.isolated=0
+		self.stats=None
+		# warning counts keyed on template, see QTIParserV1.GetWarningCounts
+		self.warnings={}
+
+def ConvertFileV1 (args):
+	"""Converts a single file in isolation, returning a QTIFileResult"""
+	options,path,name=args
+	result=QTIFileResult(path,name)
+	if os.path.basename(path)=="imsmanifest.xml":
+		# the manifest must be loaded by the parser that uses it
+		return result
+	if options.cacheDir:
+		cache=QTIFileCache(options.cacheDir)
+		try:
+			entryPath=cache.GetEntryPath(options,path,name)
+		except OSError:
+			entryPath=None
+		if entryPath:
+			cachedResult=cache.Load(entryPath)
+			if cachedResult is not None:
+				# the statistics are those of the run that saved it
+				cachedResult.stats=None
+				return cachedResult
+	# our package is streamed when it is merged, not here
+	options=copy.copy(options)
+	options.stream=0
+	parser=QTIParserV1(options)
+	LOG.StartCapture()
+	converted=0
+	try:
+		parser.ProcessFile(path,name)
+		converted=1
+	finally:
+		result.log=LOG.EndCapture()
+		if not converted:
+			# the messages logged before the failure explain it
+			LOG.Replay(result.log)
+			FlushLog()
+	result.cp=parser.cp
+	result.isolated=parser.isolated
+	result.stats=parser.stats
+	result.warnings=parser.GetWarningCounts()
+	if options.cacheDir and entryPath and result.isolated:
+		cache.Save(entryPath,result)
+	return result
+
+
+# Conversion cache
+# ----------------
+#
+# Bump this if the format of cache entries changes
+QTI_CACHE_VERSION="4"
+
+# Options that can't change the result of converting a file
+QTI_CACHE_IGNORED_OPTIONS=('jobs','stream','lowmem','cacheDir','cpPath','cpZip','incremental','mediaMethod','copyJobs','statsPath',
+	'logLevel','logJSON','logRepeat')
+
+CONVERTER_VERSION=None
+
+def GetConverterVersion ():
+	"""Returns a digest of the converter's source code"""
+	global CONVERTER_VERSION
+	if CONVERTER_VERSION is None:
+		h=hashlib.sha256(QTI_CACHE_VERSION.encode('utf-8'))
+		libDir=os.path.dirname(os.path.abspath(__file__))
+		for fName in sorted(os.listdir(libDir)):
+			if fName.endswith('.py'):
+				h.update(fName.encode('utf-8'))
+				with open(os.path.join(libDir,fName),'rb') as f:
+					h.update(f.read())
+		CONVERTER_VERSION=h.digest()
+	return CONVERTER_VERSION
+
+class QTIFileCache:
+	"""A directory of QTIFileResults from earlier runs"""
+	# entries are keyed on the input, options and converter source and are
+	# only used while the files they refer to are unchanged
+	def __init__(self,path):
+		self.path=path
+
+	def GetEntryPath (self,options,path,name):
+		h=hashlib.sha256(GetConverterVersion())
+		optionValues=sorted((name,value) for name,value in options.__dict__.items()
+			if name not in QTI_CACHE_IGNORED_OPTIONS)
+		h.update(repr(optionValues).encode('utf-8'))
+		h.update(os.path.abspath(path).encode('utf-8'))
+		h.update(name.encode('utf-8'))
+		with OpenFile(path) as f:
+			while True:
+				data=f.read(65536)
+				if not data:
+					break
+				h.update(data)
+		return os.path.join(self.path,h.hexdigest()+'.pickle')
+
+	def GetFileState (self,result):
+		state=[]
+		for r in result.cp.resources:
+			for cpf in r.files:
+				if cpf.dataPath is not None:
+					try:
+						state.append((cpf.dataPath,)+GetFileStat(cpf.dataPath))
+					except OSError:
+						state.append((cpf.dataPath,None,None))
+		return state
+
+	def Load (self,entryPath):
+		"""Returns the result cached in entryPath or None"""
+		try:
+			with open(entryPath,'rb') as f:
+				fileState,result=pickle.load(f)
+		except (OSError,EOFError,pickle.UnpicklingError):
+			return None
+		if fileState!=self.GetFileState(result):
+			return None
+		return result
+
+	def Save (self,entryPath,result):
+		try:
+			os.makedirs(self.path,exist_ok=True)
+			f=tempfile.NamedTemporaryFile('wb',dir=self.path,delete=False)
+			try:
+				pickle.dump((self.GetFileState(result),result),f,pickle.HIGHEST_PROTOCOL)
+				f.close()
+				os.replace(f.name,entryPath)
+			except:
+				f.close()
+				os.remove(f.name)
+				raise
+		except OSError:
+			LogWarning("Warning: failed to write cache entry for %s"%result.path)
+
+
+# Instrumentation
+# ---------------
+#
+class QTIConversionStats:
+	"""Timings and counters collected during a run, see --stats"""
+	# a phase's time excludes the phases nested inside it
+	def __init__(self):
+		self.start=time.perf_counter()
+		self.files=[]
+		self.items=[]
+		self.phases={}
+		self.elements={}
+		self.phaseStack=[]
+		self.phaseMark=None
+		self.file=None
+		self.fileStart=None
+		self.itemStart=None
+
+	def EnterPhase (self,phase):
+		now=time.perf_counter()
+		if self.phaseStack:
+			outer=self.phaseStack[-1]
+			self.phases[outer]=self.phases.get(outer,0.0)+now-self.phaseMark
+		self.phaseStack.append(phase)
+		self.phaseMark=now
+
+	def ExitPhase (self):
+		now=time.perf_counter()
+		phase=self.phaseStack.pop()
+		self.phases[phase]=self.phases.get(phase,0.0)+now-self.phaseMark
+		self.phaseMark=now
+
+	def StartFile (self,path):
+		self.file={'path':path,'seconds':0.0,'blocks':0,'items':0,'cached':0}
+		self.fileStart=(time.perf_counter(),sys.getallocatedblocks())
+		self.EnterPhase('parse')
+
+	def EndFile (self):
+		self.ExitPhase()
+		self.file['seconds']=time.perf_counter()-self.fileStart[0]
+		self.file['blocks']=sys.getallocatedblocks()-self.fileStart[1]
+		self.files.append(self.file)
+		self.file=None
+
+	def AddCachedFile (self,path):
+		self.files.append({'path':path,'seconds':0.0,'blocks':0,'items':0,'cached':1})
+
+	def StartItem (self):
+		self.itemStart=(time.perf_counter(),sys.getallocatedblocks())
+
+	def EndItem (self,identifier,href):
+		if self.itemStart is None:
+			return
+		self.items.append({
+			'file':self.file['path'] if self.file else None,
+			'identifier':identifier,
+			'href':href,
+			'seconds':time.perf_counter()-self.itemStart[0],
+			'blocks':sys.getallocatedblocks()-self.itemStart[1]})
+		self.itemStart=None
+		if self.file:
+			self.file['items']+=1
+
+	def CountElement (self,name):
+		self.elements[name]=self.elements.get(name,0)+1
+
+	def Merge (self,stats):
+		self.files.extend(stats.files)
+		self.items.extend(stats.items)
+		for phase,seconds in stats.phases.items():
+			self.phases[phase]=self.phases.get(phase,0.0)+seconds
+		for name,count in stats.elements.items():
+			self.elements[name]=self.elements.get(name,0)+count
+
+	def GetReport (self):
+		try:
+			import resource
+			maxRSS=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+			# the largest of any --jobs workers
+			workerMaxRSS=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+		except ImportError:
+			maxRSS=workerMaxRSS=None
+		return {
+			'totals':{
+				'seconds':time.perf_counter()-self.start,
+				'files':len(self.files),
+				'cachedFiles':sum(f['cached'] for f in self.files),
+				'items':len(self.items),
+				'maxRSS':maxRSS,
+				'workerMaxRSS':workerMaxRSS},
+			'phases':self.phases,
+			'elements':dict(sorted(self.elements.items())),
+			'files':self.files,
+			'items':self.items}
+
+	def Write (self,path):
+		# CSV if path ends in .csv, otherwise JSON
+		report=self.GetReport()
+		if path.lower().endswith('.csv'):
+			with open(path,'w',newline='',encoding='utf-8') as f:
+				writer=csv.writer(f)
+				writer.writerow(('kind','name','file','seconds','blocks','count'))
+				for phase,seconds in sorted(report['phases'].items()):
+					writer.writerow(('phase',phase,'',seconds,'',''))
+				for name,count in report['elements'].items():
+					writer.writerow(('element',name,'','','',count))
+				for fInfo in report['files']:
+					writer.writerow(('cached' if fInfo['cached'] else 'file',fInfo['path'],fInfo['path'],
+						fInfo['seconds'],fInfo['blocks'],fInfo['items']))
+				for item in report['items']:
+					writer.writerow(('item',item['identifier'],item['file'],item['seconds'],item['blocks'],''))
+		else:
+			with open(path,'w',encoding='utf-8') as f:
+				json.dump(report,f,indent=1)
+				f.write('\n')
+
+
+
 
 """
 <?xml version='1.0' encoding='UTF-8' ?>
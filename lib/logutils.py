@@ -0,0 +1,152 @@
+#! /usr/bin/env python3
+
+"""Copyright (c) 2008, University of Cambridge.
+
+All rights reserved.
+
+Redistribution and use of this software in source and binary forms
+(where applicable), with or without modification, are permitted
+provided that the following conditions are met:
+
+ *  Redistributions of source code must retain the above copyright
+    notice, this list of conditions, and the following disclaimer.
+
+ *  Redistributions in binary form must reproduce the above
+    copyright notice, this list of conditions, and the following
+    disclaimer in the documentation and/or other materials provided with
+    the distribution.
+
+ *  Neither the name of the University of Cambridge, nor the names of
+    any other contributors to the software, may be used to endorse or
+    promote products derived from this software without specific prior
+    written permission.
+
+THIS SOFTWARE IS PROVIDED ``AS IS'', WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
+
+import sys
+import json
+import atexit
+import threading
+
+# Message levels, progress messages are informational
+LOG_INFO=20
+LOG_WARNING=30
+LOG_ERROR=40
+
+LOG_LEVELS={'info':LOG_INFO,'warning':LOG_WARNING,'error':LOG_ERROR}
+LOG_LEVEL_NAMES={LOG_INFO:'info',LOG_WARNING:'warning',LOG_ERROR:'error'}
+
+# Output is written in chunks of about this many characters
+LOG_BUFFER_SIZE=65536
+
+class MessageLog:
+	"""The messages written by the migration tool during a run"""
+	def __init__ (self):
+		self.level=LOG_INFO
+		self.jsonLines=0
+		self.repeatLimit=0
+		self.file=None
+		self.lines=[]
+		self.size=0
+		# level and count of each message, if repeatLimit is set
+		self.repeats={}
+		# (level,message,file) records kept while capturing, for Replay
+		self.records=None
+		self.lock=threading.RLock()
+
+	def Configure (self,level=LOG_INFO,jsonLines=0,repeatLimit=0):
+		with self.lock:
+			self.level=level
+			self.jsonLines=jsonLines
+			self.repeatLimit=repeatLimit
+
+	def SetFile (self,path):
+		self.file=path
+
+	def Log (self,level,message):
+		message=str(message)
+		with self.lock:
+			if self.records is not None:
+				self.records.append((level,message,self.file))
+			else:
+				self.WriteRecord(level,message,self.file)
+
+	def WriteRecord (self,level,message,file):
+		if level<self.level:
+			return
+		if self.repeatLimit:
+			seen=self.repeats.get(message)
+			if seen is None:
+				self.repeats[message]=[level,1]
+			else:
+				seen[1]+=1
+				if seen[1]>self.repeatLimit:
+					return
+		if self.jsonLines:
+			line=json.dumps({'level':LOG_LEVEL_NAMES.get(level,level),'message':message,'file':file})+'\n'
+		else:
+			line=message+'\n'
+		self.lines.append(line)
+		self.size+=len(line)
+		if self.size>=LOG_BUFFER_SIZE:
+			self.Flush()
+
+	def Flush (self):
+		with self.lock:
+			if self.lines:
+				sys.stdout.write(''.join(self.lines))
+				self.lines=[]
+				self.size=0
+			sys.stdout.flush()
+
+	def StartCapture (self):
+		with self.lock:
+			self.records=[]
+
+	def EndCapture (self):
+		with self.lock:
+			records=self.records
+			self.records=None
+		return records
+
+	def Replay (self,records):
+		with self.lock:
+			for level,message,file in records:
+				if self.records is not None:
+					self.records.append((level,message,file))
+				else:
+					self.WriteRecord(level,message,file)
+
+	def SummarizeRepeats (self):
+		with self.lock:
+			repeats=self.repeats
+			self.repeats={}
+			for message,(level,count) in repeats.items():
+				if count>self.repeatLimit:
+					self.WriteRecord(level,"%s (repeated %i more times)"%(message,count-self.repeatLimit),None)
+
+	def Close (self):
+		self.SummarizeRepeats()
+		self.Flush()
+
+
+LOG=MessageLog()
+atexit.register(LOG.Close)
+
+def LogInfo (message):
+	LOG.Log(LOG_INFO,message)
+
+def LogWarning (message):
+	LOG.Log(LOG_WARNING,message)
+
+def LogError (message):
+	LOG.Log(LOG_ERROR,message)
+
+def FlushLog ():
+	LOG.Flush()
@@ -28,6 +28,9 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
 
 import string
+import re
+
+from logutils import *
 
 class RTFException(Exception): pass
 
@@ -82,7 +85,19 @@ RTFIgnorable={
 	"ulw":1,
 	}
 
+# Control words with ASCII names are matched whole, anything followed by a
+# non-ASCII character is left to the character level methods
+RTF_TEXT=re.compile('[^\\\\{}]+')
+RTF_CONTROLWORD=re.compile('\\\\([A-Za-z]+)(?![A-Za-z\x80-\U0010FFFF])'
+	'(?:(-?[0-9]+)(?![0-9\x80-\U0010FFFF]) ?| |(?![-0-9]))')
+
 class RTFParser:
+	"""Converts RTF into a list of tokens in the format used by
+	xmlutils.XMLParser.
+
+	Runs of text and control words are matched with regular expressions so
+	large ignored groups, such as font tables and pictures, are skipped in
+	a few steps."""
 	def __init__(self):
 		self.ResetParser()
 
@@ -96,10 +111,10 @@ class RTFParser:
 
 	def HandleUnknown(self,name,param):
 		if name not in RTFIgnorable and not self.state.ignoreGroup:
-			print("Ignoring unknown RTF Control word: %s"%name)
+			LogWarning("Ignoring unknown RTF Control word: %s"%name)
 
 	def HandleUnknownSymbol(self,symbol):
-		print('Ignoring unknown RTF Control symbol: "%s"'%symbol)
+		LogWarning('Ignoring unknown RTF Control symbol: "%s"'%symbol)
 		pass
 
 	def Handle_uc(self,name,param):
@@ -113,11 +128,15 @@ class RTFParser:
 	def Handle_fonttbl(self,name,param):
 		self.state.ignoreGroup=1
 
+	def Handle_pict(self,name,param):
+		# pictures can't be converted, skip the hex data
+		self.state.ignoreGroup=1
+
 	def Handle_fcharset(self,name,param):
 		if param==2:
-			print("Warning: RTF content defines unsupported Symbol font, check for bad characters")
+			LogWarning("Warning: RTF content defines unsupported Symbol font, check for bad characters")
 		elif param:
-			print("Warning: RTF content defines unsupported fcharset, check for bad characters")
+			LogWarning("Warning: RTF content defines unsupported fcharset, check for bad characters")
 
 	def Handle_pard(self,name,param):
 		# reset default paragraph properties
@@ -183,40 +202,50 @@ class RTFParser:
 		pass
 
 	def Handle_lang(self,name,param):
-		print("Warning: RTF language specification currently ignored (%i)"%param)
+		LogWarning("Warning: RTF language specification currently ignored (%i)"%param)
 
 	def TokenizeString(self,input):
 		self.ResetParser()
 		self.input=input
 		self.pos=0
-		self.Consume(0)
-		while self.c:
-			if self.ParseChar('\\'):
-				if self.c.isalpha():
-					# Control Word
-					cword=self.ParseControlWord()
-					# Horribly, we use introspection here
-					getattr(self,"Handle_%s"%cword['.name'],self.HandleUnknown)(cword['.name'],cword.get('.param',None))
+		end=len(input)
+		while self.pos<end:
+			match=RTF_TEXT.match(input,self.pos)
+			if match:
+				if not self.state.ignoreGroup:
+					self.chars.append(match.group())
+				self.pos=match.end()
+			elif input[self.pos]=='\\':
+				match=RTF_CONTROLWORD.match(input,self.pos)
+				if match:
+					self.pos=match.end()
+					name,param=match.groups()
+					if param is not None:
+						param=int(param)
 				else:
-					# Control symbol
-					cword={'.name':self.c}
 					self.Consume(1)
-					getattr(self,"Handle_X%2X"%ord(cword['.name']),self.HandleUnknownSymbol)(cword['.name'])
+					c=self.input[self.pos:self.pos+1]
+					if not c.isalpha():
+						# Control symbol
+						self.Consume(1)
+						getattr(self,"Handle_X%2X"%ord(c),self.HandleUnknownSymbol)(c)
+						continue
+					cword=self.ParseControlWord()
+					name,param=cword['.name'],cword.get('.param',None)
+				# Horribly, we use introspection here
+				getattr(self,"Handle_%s"%name,self.HandleUnknown)(name,param)
 			elif self.ParseChar('{'):
 				# start of a group
 				self.stack.append(self.state)
 				self.state=self.state.Clone()
-			elif self.ParseChar('}'):
+			else:
 				# end of a group
+				self.Consume(1)
 				if self.stack:
 					self.state=self.stack.pop()
 					self.StateChanged()
 				else:
 					raise RTFException('too many "}" at "%s..."'%self.input[self.pos:self.pos+8])
-			else:
-				if not self.state.ignoreGroup:
-					self.chars.append(self.c)
-				self.Consume(1)
 		self.EndString()
 		if self.popen:
 			self.tokens.append({'.name':'p','.type':'ETag'})
@@ -226,47 +255,38 @@ class RTFParser:
 		cword={}
 		name=self.ParseLetterSequence()
 		cword['.name']=name
-		if self.c==" ":
+		c=self.input[self.pos:self.pos+1]
+		if c==" ":
 			self.Consume(1)
-		elif self.c.isdigit() or self.c=="-":
+		elif c.isdigit() or c=="-":
 			param=self.ParseNumber()
-			if self.c==" ":
-				self.Consume(1)
+			self.ParseChar(" ")
 			cword['.param']=param
 		return cword
 
 	def ParseLetterSequence(self):
-		name=[]
-		while self.c:
-			# strictly speaking these should be lower case
-			# and they are supposed to be no more than 32 chars
-			if self.c.isalpha():
-				name.append(self.c)
-				self.Consume(1)
-			else:
-				break
-		return ''.join(name)
+		start=self.pos
+		# strictly speaking these should be lower case
+		# and they are supposed to be no more than 32 chars
+		while self.input[self.pos:self.pos+1].isalpha():
+			self.Consume(1)
+		return self.input[start:self.pos]
 
 	def ParseNumber(self):
-		num=[]
-		if self.c=="-":
+		if self.ParseChar("-"):
 			value=-1
-			self.Consume(1)
 		else:
 			value=1
-		while self.c:
-			if self.c.isdigit():
-				num.append(self.c)
-				self.Consume(1)
-			else:
-				break
-		if not num:
+		start=self.pos
+		while self.input[self.pos:self.pos+1].isdigit():
+			self.Consume(1)
+		if start==self.pos:
 			raise RTFException('bad control word at "%s..."'%self.input[self.pos:self.pos+8])
 		else:
-			return value*int(''.join(num))
+			return value*int(self.input[start:self.pos])
 
 	def ParseChar (self,c):
-		if self.c==c:
+		if self.input.startswith(c,self.pos):
 			self.Consume(1)
 			return 1
 		else:
@@ -292,4 +312,3 @@ class RTFParser:
 
 	def Consume(self,nChars):
 		self.pos+=nChars
-		self.c=self.input[self.pos:self.pos+1]
@@ -28,8 +28,12 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
 
 import string
+import re
+import functools
 import html.entities
 
+from logutils import *
+
 NMTOKEN_CHARS=string.ascii_letters+string.digits+"_-.:"
 NMSTART_CHARS=string.ascii_letters+"_"
 
@@ -38,23 +42,23 @@ scheme_char=string.ascii_letters+string.digits+"+-."
 
 class XMLException(Exception): pass
 
+XMLSTRING_SPECIALS=re.compile('[&<>"\x81-\U0010FFFF]')
+XMLSTRING_CHARREFS=re.compile('[\x81-\U0010FFFF]')
+
+def XMLCharRef (match):
+	return "&#"+str(ord(match.group()))+';'
+
 def XMLString (src):
-	dst=""
-	if src:
-		for c in src:
-			if c=='&':
-				dst=dst+"&amp;"
-			elif c=='<':
-				dst=dst+"&lt;"
-			elif c=='>':
-				dst=dst+"&gt;"
-			elif c=='"':
-				dst=dst+'&quot;'
-			elif ord(c)>128:
-				dst=dst+"&#"+str(ord(c))+';'
-			else:
-				dst=dst+c
-	return dst
+	if not src:
+		return ""
+	if XMLSTRING_SPECIALS.search(src) is None:
+		# the common case: nothing to escape
+		return src
+	src=src.replace('&','&amp;').replace('<','&lt;').replace('>','&gt;').replace('"','&quot;')
+	if XMLSTRING_CHARREFS.search(src) is not None:
+		# characters above 128 become numeric character references
+		src=XMLSTRING_CHARREFS.sub(XMLCharRef,src)
+	return src
 
 def EncodeComment (src):
 	return src.replace('--','- - ')
@@ -70,45 +74,103 @@ def RelativeURL (uri):
 		return 0
 	return 1
 
-def EncodePathSegment (pathSegment):
-	newPathSegment=""
-	warn=0
-	for c in pathSegment:
-		if c in pchar:
-			newPathSegment=newPathSegment+c
-		elif ord(c)>255:
-			# should really UTF-8 this but we'll cheat for now
-			warn=1
-			newPathSegment=newPathSegment+"?"
+PATH_SEGMENT_CACHE_SIZE=4096
+
+class PathEncodeTable(dict):
+	def __missing__(self,c):
+		# should really UTF-8 this but we'll cheat for now
+		return "?"
+
+def MakePathEncodeTable ():
+	"""Maps the ordinals of latin-1 characters to their encoded form"""
+	table=PathEncodeTable()
+	for c in range(256):
+		if chr(c) in pchar:
+			table[c]=chr(c)
 		else:
-			newPathSegment=newPathSegment+'%'+hex(ord(c))[2:].zfill(2)
+			table[c]='%'+hex(c)[2:].zfill(2)
+	return table
+
+PATH_ENCODE_TABLE=MakePathEncodeTable()
+PATH_ENCODE_SPECIALS=re.compile('[^'+re.escape(pchar)+']')
+
+@functools.lru_cache(maxsize=PATH_SEGMENT_CACHE_SIZE)
+def EncodePathSegmentData (pathSegment):
+	"""Returns the encoded pathSegment and a flag indicating that a unicode
+	character had to be replaced."""
+	if PATH_ENCODE_SPECIALS.search(pathSegment) is None:
+		return pathSegment,0
+	return pathSegment.translate(PATH_ENCODE_TABLE),max(pathSegment)>'\xff'
+
+def EncodePathSegment (pathSegment):
+	newPathSegment,warn=EncodePathSegmentData(pathSegment)
 	if warn:
-		print("Warning: replacing unicode character in path name: "+pathSegment)
+		LogWarning("Warning: replacing unicode character in path name: "+pathSegment)
 	return newPathSegment
 
+def MakePathDecodeTable ():
+	"""Maps every pair of hex digits to the character they encode"""
+	table={}
+	for h1 in "0123456789ABCDEFabcdef":
+		for h2 in "0123456789ABCDEFabcdef":
+			table[h1+h2]=chr(int(h1+h2,16))
+	return table
+
+PATH_DECODE_TABLE=MakePathDecodeTable()
+
+# A '%' followed by two hex digits is decoded.  A '%' followed by at most one
+# hex digit is dropped if the segment ends or another '%' follows, otherwise
+# it is kept (but not the character that ended it).
+PATH_DECODE_ESCAPES=re.compile('%(?:([0-9A-Fa-f]{2})|([0-9A-Fa-f]?)(?:(?=%)|\\Z|(.)))',re.S)
+
+def PathDecodeEscape (match):
+	hexStr,partial,end=match.groups()
+	if hexStr:
+		return PATH_DECODE_TABLE[hexStr]
+	elif end is None:
+		return ""
+	else:
+		return '%'+partial
+
+@functools.lru_cache(maxsize=PATH_SEGMENT_CACHE_SIZE)
 def DecodePathSegment (pathSegment):
-	newPathSegment=""
-	hexStr=""
-	for c in pathSegment:
-		if c=="%":
-			hexStr="0x"
-		elif hexStr:
-			if c in "0123456789ABCDEFabcdef":
-				hexStr=hexStr+c
-			else:
-				newPathSegment=newPathSegment+'%'+hexStr[2:]
-				hexStr=""
-		else:
-			newPathSegment=newPathSegment+c
-		if len(hexStr)==4:
-			newPathSegment=newPathSegment+chr(eval(hexStr))
-			hexStr=""
-	return newPathSegment
+	if '%' not in pathSegment:
+		return pathSegment
+	return PATH_DECODE_ESCAPES.sub(PathDecodeEscape,pathSegment)
 
 
 SCHARS=[0x20,0x09,0x0D,0x0A]
 
+# Regular expressions used by XMLParser, note that in names all characters
+# above 128 are allowed
+XML_NAMESTART='A-Za-z_\x81-\U0010FFFF'
+XML_NAMECHAR='-A-Za-z0-9_.:\x81-\U0010FFFF'
+XML_S='[ \t\r\n]*'
+# names are matched greedily, without backtracking, as ParseName does
+XML_NAME_RE='['+XML_NAMESTART+']['+XML_NAMECHAR+']*(?!['+XML_NAMECHAR+'])'
+XML_ATTRIBUTE_RE=(XML_S+'('+XML_NAME_RE+')'+XML_S+'='+XML_S+
+	'(?:"([^"&]*)"|\'([^\'&]*)\')')
+XML_TEXT=re.compile('[^<&]+')
+XML_SPACE=re.compile(XML_S)
+XML_NAME=re.compile('(?:['+XML_NAMESTART+']['+XML_NAMECHAR+']*)?')
+XML_NMTOKEN=re.compile('['+XML_NAMECHAR+']*')
+XML_ATTVALUE={'"':re.compile('[^"&]+'),"'":re.compile("[^'&]+")}
+XML_ATTRIBUTE=re.compile(XML_ATTRIBUTE_RE)
+# Tags with simple attribute values, end tags and named entity references are
+# matched whole, anything else is left to the character level methods
+XML_STAG=re.compile('<('+XML_NAME_RE+')((?:'+XML_ATTRIBUTE_RE+')*)'+XML_S+'(/?)>')
+XML_ETAG=re.compile('</((?:'+XML_NAME_RE+')?)'+XML_S+'>')
+XML_ENTITYREF=re.compile('&(?!#)((?:'+XML_NAME_RE+')?);?')
+
 class XMLParser:
+	"""A forgiving tokenizer for the HTML embedded in QTI material.
+
+	TokenizeString returns a list of tokens, each token is either a string of
+	character data or a dictionary representing a tag.  The tag's name is
+	stored with key '.name' and its type ('STag', 'ETag' or 'EmptyElemTag')
+	with key '.type', other keys are the tag's attributes.  Runs of data and
+	well-formed tags are matched with regular expressions, the character
+	level methods are only used to recover from bad markup."""
 	def __init__(self,entityMap=None):
 		self.entityMap=entityMap
 		if not self.entityMap:
@@ -124,30 +186,60 @@ class XMLParser:
 	def TokenizeString(self,input):
 		self.input=input
 		self.pos=0
-		self.Consume(0)
 		tokens=[]
 		chars=[]
-		while self.c:
-			if self.ParseChar('<'):
+		end=len(input)
+		while self.pos<end:
+			match=XML_TEXT.match(input,self.pos)
+			if match:
+				chars.append(match.group())
+				self.pos=match.end()
+				continue
+			match=XML_ENTITYREF.match(input,self.pos)
+			if match:
+				chars.append(self.LookupEntity(match.group(1)))
+				self.pos=match.end()
+				continue
+			match=XML_STAG.match(input,self.pos) or XML_ETAG.match(input,self.pos)
+			if match:
+				tag=self.MatchTag(match)
+				self.pos=match.end()
+			elif self.ParseChar('<'):
 				if self.ParseChar('/'):
 					tag=self.ParseETag()
 				else:
 					# may return '<' if no name followed
 					tag=self.ParseTag()
-				if chars:
-					tokens.append(''.join(chars))
-					chars=[]
-				tokens.append(tag)
-			elif self.ParseChar('&'):
-				chars.append(self.ParseReference())
 			else:
-				chars.append(self.c)
-				self.Consume(1)
+				self.pos+=1
+				chars.append(self.ParseReference())
+				continue
+			if chars:
+				tokens.append(''.join(chars))
+				chars=[]
+			tokens.append(tag)
 		if chars:
 			tokens.append(''.join(chars))
 			chars=[]
 		return tokens
 
+	def MatchTag(self,match):
+		tag={}
+		tag['.name']=match.group(1)
+		if match.re is XML_ETAG:
+			tag['.type']='ETag'
+			return tag
+		for aName,aValue,aValue2 in XML_ATTRIBUTE.findall(match.group(2)):
+			if aValue or not aValue2:
+				tag[aName]=aValue
+			else:
+				tag[aName]=aValue2
+		if match.group(6):
+			tag['.type']='EmptyElemTag'
+		else:
+			tag['.type']='STag'
+		return tag
+
 	def ParseTag(self):
 		tag={}
 		name=self.ParseName()
@@ -156,7 +248,7 @@ class XMLParser:
 		tag['.name']=name
 		while True:
 			self.SkipSpace()
-			if not self.c:
+			if self.pos>=len(self.input):
 				raise XMLException("unexpected end of tag")
 			if self.ParseChar('>'):
 				tag['.type']='STag'
@@ -166,7 +258,7 @@ class XMLParser:
 					tag['.type']='EmptyElemTag'
 					break
 				else:
-					print(self.input[self.pos:])
+					LogError(self.input[self.pos:])
 					raise XMLException("expected: end of tag")
 			else:
 				aName=self.ParseName()
@@ -190,7 +282,6 @@ class XMLParser:
 		return tag
 
 	def ParseAttValue(self):
-		delim=None
 		value=[]
 		if self.ParseChar('"'):
 			delim='"'
@@ -198,18 +289,18 @@ class XMLParser:
 			delim="'"
 		else:
 			raise XMLException("expected: AttValue")
+		valueChars=XML_ATTVALUE[delim]
 		while True:
-			if not self.c:
+			if self.pos>=len(self.input):
 				raise XMLException("unexpected end of AttValue")
-			elif self.c==delim:
-				self.Consume(1)
+			elif self.ParseChar(delim):
 				break
-			elif self.c=='&':
-				self.Consume(1)
+			elif self.ParseChar('&'):
 				value.append(self.ParseReference())
 			else:
-				value.append(self.c)
-				self.Consume(1)
+				match=valueChars.match(self.input,self.pos)
+				value.append(match.group())
+				self.pos=match.end()
 		return ''.join(value)
 
 	def ParseReference (self):
@@ -219,52 +310,30 @@ class XMLParser:
 			else:
 				value=chr(int(self.ParseName(1)))
 		else:
-			name=self.ParseName()
-			value=self.entityMap.get(name.lower(),chr(html.entities.name2codepoint.get(name.lower(),63)))
+			value=self.LookupEntity(self.ParseName())
 		# forgive the lack of a semi-colon
 		self.ParseChar(';')
 		return value
 
+	def LookupEntity (self,name):
+		name=name.lower()
+		return self.entityMap.get(name,chr(html.entities.name2codepoint.get(name,63)))
+
 	def ParseName (self,numbersAllowed=0):
-		name=[]
 		# Names end with a space, '>', '/>' or ';'
-		while self.c:
-			if ord(self.c) in SCHARS:
-				break
-			if self.c in "<>/;=":
-				break
-			if name or numbersAllowed:
-				if not (self.c in NMTOKEN_CHARS or ord(self.c)>128):
-					break
-			else:
-				if not (self.c in NMSTART_CHARS or ord(self.c)>128):
-					break
-			name.append(self.c)
-			self.Consume(1)
-		return ''.join(name)
+		if numbersAllowed:
+			match=XML_NMTOKEN.match(self.input,self.pos)
+		else:
+			match=XML_NAME.match(self.input,self.pos)
+		self.pos=match.end()
+		return match.group()
 
 	def SkipSpace (self):
-		while self.c:
-			if ord(self.c) in SCHARS:
-				self.Consume(1)
-			else:
-				break
+		self.pos=XML_SPACE.match(self.input,self.pos).end()
 
 	def ParseChar (self,c):
-		if self.c==c:
-			self.Consume(1)
+		if self.input.startswith(c,self.pos):
+			self.pos+=1
 			return 1
 		else:
 			return 0
-
-	def Consume(self,nChars):
-		self.pos+=nChars
-		self.c=self.input[self.pos:self.pos+1]
-
-
-
-
-
-
-
-
@@ -33,6 +33,7 @@ WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE."""
 MIGRATION_VERSION="2008-06-12"
 
 import os, sys
+import multiprocessing
 from stat import *
 
 SPLASH_LOG=[
@@ -61,13 +62,31 @@ HELP_TEXT=[
 	"  --version          : display version information only (implies --nogui)"
 	"  --overwrite		  : If the files already exist overwrite them"
 	"  --pathprepend	  : A path to prepend to file references"
-	"  --createerrorfiles : If a referenced file is not found create a dummy file in its place"
+	"  --createerrorfiles : If a referenced file is not found create a dummy file in its place",
+	"  --jobs=<n>         : convert files using n worker processes",
+	"  --stream           : write each item to --cpout as soon as it is converted",
+	"  --lowmem           : parse files without building a document tree first",
+	"  --cache=<dir>      : reuse the results of unchanged files from earlier runs",
+	"  --incremental      : update an existing --cpout, only writing files that changed",
+	"  --media=<method>   : place media files in --cpout by copy, hardlink or reflink",
+	"  --cpzip=<file>     : write the content package to a zip file instead of --cpout",
+	"  --copyjobs=<n>     : copy media files into --cpout using n threads",
+	"  --dedupmedia       : store media files with identical data only once",
+	"  --fixcase          : match file references to files whose names differ in case",
+	"  --stats=<file>     : write timings and counters to a JSON (or .csv) file",
+	"  --loglevel=<level> : only show messages of level info, warning or error and above",
+	"  --quiet            : only show warnings and errors (same as --loglevel=warning)",
+	"  --logjson          : write messages as JSON lines for a calling program to parse",
+	"  --logrepeat=<n>    : show each distinct message at most n times",
+	"  --idseed=<seed>    : vary the identifiers made for objects without an ident"
 ]
 
 
 NO_GUI=0
 
 if __name__ == '__main__':
+	# needed for --jobs in frozen (py2exe) builds
+	multiprocessing.freeze_support()
 	wd=os.path.dirname(__file__)
 	sys.path.append(os.path.join(wd,"lib"))
 	try:
@@ -114,15 +133,79 @@ if __name__ == '__main__':
 			options.prepend_path = x[14:]
 		elif x.lower()=="--createerrorfiles":
 			options.create_error_files = 1
+		elif x[:7].lower()=="--jobs=":
+			try:
+				options.jobs=max(1,int(x[7:]))
+			except ValueError:
+				SPLASH_LOG.append("Warning: bad value for --jobs, ignoring \"%s\""%x[7:])
+		elif x.lower()=="--stream":
+			options.stream=1
+		elif x.lower()=="--lowmem":
+			options.lowmem=1
+		elif x[:8].lower()=="--cache=":
+			options.cacheDir=os.path.abspath(x[8:])
+		elif x.lower()=="--incremental":
+			options.incremental=1
+		elif x[:8].lower()=="--media=":
+			if x[8:].lower() in imsqtiv1.MEDIA_METHODS:
+				options.mediaMethod=x[8:].lower()
+			else:
+				SPLASH_LOG.append("Warning: unknown --media method, ignoring \"%s\""%x[8:])
+		elif x[:8].lower()=="--cpzip=":
+			options.cpZip=os.path.abspath(x[8:])
+		elif x.lower()=="--dedupmedia":
+			options.dedupMedia=1
+		elif x.lower()=="--fixcase":
+			options.fixCase=1
+		elif x[:8].lower()=="--stats=":
+			options.statsPath=os.path.abspath(x[8:])
+		elif x[:11].lower()=="--loglevel=":
+			if x[11:].lower() in imsqtiv1.LOG_LEVELS:
+				options.logLevel=imsqtiv1.LOG_LEVELS[x[11:].lower()]
+			else:
+				SPLASH_LOG.append("Warning: unknown --loglevel, ignoring \"%s\""%x[11:])
+		elif x.lower()=="--quiet":
+			options.logLevel=imsqtiv1.LOG_WARNING
+		elif x.lower()=="--logjson":
+			options.logJSON=1
+		elif x[:12].lower()=="--logrepeat=":
+			try:
+				options.logRepeat=max(0,int(x[12:]))
+			except ValueError:
+				SPLASH_LOG.append("Warning: bad value for --logrepeat, ignoring \"%s\""%x[12:])
+		elif x[:9].lower()=="--idseed=":
+			options.idSeed=x[9:]
+		elif x[:11].lower()=="--copyjobs=":
+			try:
+				options.copyJobs=max(1,int(x[11:]))
+			except ValueError:
+				SPLASH_LOG.append("Warning: bad value for --copyjobs, ignoring \"%s\""%x[11:])
 		else:
 			fileNames.append(x)
 
 	if not options.dtdDir:
 		options.dtdDir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'schemas'))
 
+	if options.cpZip:
+		if options.cpPath:
+			SPLASH_LOG.append("Warning: --cpzip given, ignoring --cpout")
+			options.cpPath=''
+		if os.path.isdir(options.cpZip):
+			SPLASH_LOG.append("Warning: --cpzip points to directory, ignoring")
+			options.cpZip=''
+		elif os.path.exists(options.cpZip):
+			if OVERWRITE:
+				SPLASH_LOG.append("Warning: CP zip file already exists, overwriting.")
+			else:
+				reply=input("Warning: CP zip file already exists, overwrite? (Yes/No)>")
+				if reply.lower()!="yes":
+					options.cpZip=''
+
 	if options.cpPath and os.path.exists(options.cpPath):
 		if os.path.isdir(options.cpPath):
-			if OVERWRITE:
+			if options.incremental:
+				SPLASH_LOG.append("Warning: CP Directory already exists, updating changed files only.")
+			elif OVERWRITE:
 				SPLASH_LOG.append("Warning: CP Directory already exists, overwriting.")
 			else:
 				reply=input("Warning: CP Directory already exists, overwrite? (Yes/No)>")
@@ -141,11 +224,19 @@ if __name__ == '__main__':
 			NO_GUI=1
 
 	if NO_GUI:
-		for line in SPLASH_LOG:
-			print(line)
 		parser=imsqtiv1.QTIParserV1(options)
+		log=imsqtiv1.LogInfo
+		for line in SPLASH_LOG:
+			# warnings must survive --quiet, as must their " ..." details
+			if line.startswith("Warning"):
+				log=imsqtiv1.LogWarning
+			elif not line.startswith(" ..."):
+				log=imsqtiv1.LogInfo
+			log(line)
 		parser.ProcessFiles(os.getcwd(),fileNames)
 		parser.DumpCP()
+		parser.SummarizeWarnings()
+		parser.DumpStats()
 	else:
 		print("Application is active...")
 		print("Do not close this window because it will also close the GUI!")
@@ -1,3 +1,16 @@
 #!/bin/bash
 ./migrate.py --ucvars --nogui --overwrite --cpout=test/out/ test/orig/
+./checkgolden.py --jobs=4 assessments/orig || exit 1
+./checkgolden.py --jobs=4 assessments/items || exit 1
+./checkgolden.py --jobs=4 --stream assessments/items || exit 1
+# media written into the package must never replace the input's own copy
+tmp=$(mktemp -d)
+cp -r assessments/items/generated "$tmp/in"
+./migrate.py --nogui --overwrite --cpout="$tmp/in/img" "$tmp/in" >/dev/null 2>&1
+rc=0
+for f in assessments/items/generated/img/*; do
+	cmp -s "$f" "$tmp/in/img/${f##*/}" || { echo "Input file lost: ${f##*/}"; rc=1; }
+done
+rm -rf "$tmp"
+[ $rc -eq 0 ] || exit 1
 exit